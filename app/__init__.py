@@ -4,9 +4,10 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, get_jwt, get_jwt_identity, set_access_cookies
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from .util.replicas import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 jwt = JWTManager()
 migrate = Migrate()
 
@@ -22,6 +23,25 @@ def create_app():
     )
 
     app.config.from_object('config.Config')
+
+    from .util.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    from .util.request_metrics import init_request_metrics
+    from .util.sql_profile import init_sql_profile
+    init_request_metrics(app)
+    init_sql_profile(app)
+
+    from .util.db_pool import engine_options
+    from .util.replicas import replica_binds, set_sticky_cookie
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    app.config['SQLALCHEMY_BINDS'] = {
+        **replica_binds(app.config, engine_options),
+        **(app.config.get('SQLALCHEMY_BINDS') or {}),
+    }
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
@@ -40,6 +60,8 @@ def create_app():
             # Case where there is not a valid JWT. Just return the original response
             return response
 
+    app.after_request(set_sticky_cookie)
+
     @app.after_request
     def apply_security_headers(response):
         response.headers['Content-Security-Policy'] = (
@@ -65,4 +87,9 @@ def create_app():
         from .api._api import register_apis
         register_apis(app)
 
+    from .util.item_metadata import refresh_item_metadata_command
+    from .util.sync import prune_tombstones_command
+    app.cli.add_command(refresh_item_metadata_command)
+    app.cli.add_command(prune_tombstones_command)
+
     return app
@@ -10,6 +10,9 @@ def register_apis(app):
     from .catalogs import catalogs
     api.register_blueprint(catalogs, url_prefix="/catalogs")
 
+    from .feed import feed
+    api.register_blueprint(feed, url_prefix='/feed')
+
     from .reviews import reviews
     api.register_blueprint(reviews, url_prefix='/reviews')
 
@@ -20,3 +23,6 @@ def register_apis(app):
     api.register_blueprint(user, url_prefix='/user')
 
     app.register_blueprint(api)
+
+    from .internal import internal
+    app.register_blueprint(internal, url_prefix='/internal')
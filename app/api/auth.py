@@ -1,15 +1,21 @@
 from flask import Blueprint, jsonify, request, make_response
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import jwt_required
 from app.models import User
 from app import db
 from app.util.auth import set_user_cookies
-from app.util.query import get_current_user_reviews
+from app.util.identity import current_user
+from app.util.passwords import PasswordHasherBusy, hash_password, needs_rehash, verify_password
+from app.util.query import get_current_user_summary
 
 
 auth = Blueprint('auth', __name__)
 
 
+@auth.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+
+
 @auth.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -20,7 +26,7 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'User already exists'}), 400
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     new_user = User(
         username=username,
         email=email,
@@ -40,20 +46,26 @@ def login():
 
     # todo: username, either instead of or alternative to email
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if user:
+        # detached, the row keeps its loaded values through the rollback instead of
+        # being expired and selected again
+        db.session.expunge(user)
+    # hand the connection back to the pool while waiting on the hasher
+    db.session.rollback()
+    if not user or not verify_password(user.password_hash, password):
         return jsonify({'error': 'Invalid credentials'}), 401
 
-    reviews = get_current_user_reviews(user.id)
-
-    response_data = {
-        "userId": user.id,
-        "username": user.username,
-        "displayName": user.display_name,
-        "profilePicUrl": user.profile_pic_url,
-        "reviews": reviews,
-    }
-    
-    response = make_response(jsonify(response_data), 200)
+    # upgrade hashes made with older parameters while the plaintext is at hand;
+    # if the hasher is busy the next login tries again
+    if needs_rehash(user.password_hash):
+        try:
+            password_hash = hash_password(password)
+            db.session.merge(user, load=False).password_hash = password_hash
+            db.session.commit()
+        except PasswordHasherBusy:
+            db.session.rollback()
+
+    response = make_response(jsonify(get_current_user_summary(user)), 200)
     response = set_user_cookies(response, str(user.id))
 
     return response
@@ -73,16 +85,8 @@ def logout():
 @auth.route('/verify', methods=['GET'])
 @jwt_required()
 def verify():
-    current_user = get_jwt_identity()
-    user = User.query.filter_by(id=current_user).first()
-    reviews = get_current_user_reviews(user.id)
-
-    response_data = {
-        "userId": user.id,
-        "username": user.username,
-        "displayName": user.display_name,
-        "profilePicUrl": user.profile_pic_url,
-        "reviews": reviews,
-    }
-
-    return jsonify(response_data), 200
+    user = current_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    return jsonify(get_current_user_summary(user)), 200
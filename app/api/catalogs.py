@@ -1,10 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, ArtistAlbumTrack, Artist, Album, Track, Catalog, CatalogItem
+from app.models import db, Catalog, CatalogItem
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
 from datetime import datetime
+from app.util.cache import get_or_build_version
+from app.util.catalogs import (
+    ARTIST_CATALOGS_PAGE_SIZE,
+    CATALOG_ITEMS_PAGE_SIZE,
+    apply_catalog_item_operations,
+    artist_catalogs_page,
+    build_catalog_document,
+    catalog_etag,
+    catalog_items_page,
+    catalog_changes,
+    catalog_listing,
+    fork_catalog,
+    is_integer,
+    move_catalog_item,
+    next_catalog_position,
+    record_catalog_item_tombstones,
+    serialize_catalog_header,
+    touch_catalog,
+)
+from app.util.feed import record_activity, remove_activities
+from app.util.item_metadata import item_metadata_for
+from app.util.replicas import read_replica
+from app.util.search import SEARCH_PAGE_SIZE, search_catalogs
 from app.util.spotify import validate_item_in_database
+from app.util.sync import decode_sync_token
 
 
 catalogs = Blueprint("catalogs", __name__)
@@ -34,6 +57,9 @@ def create_catalog():
     )
 
     db.session.add(catalog)
+    db.session.flush()
+    if not catalog.is_private:
+        record_activity(user_id, "catalog", catalog_id=catalog.id)
     db.session.commit()
 
     return jsonify({"message": "Catalog created successfully", "id": catalog.id}), 201
@@ -41,147 +67,135 @@ def create_catalog():
 
 @catalogs.route("/user", methods=["GET"])
 @jwt_required()
+@read_replica
 def get_current_user_catalogs():
     user_id = get_jwt_identity()
 
-    catalogs = Catalog.query.filter_by(user_id=user_id).all()
+    return jsonify(catalog_listing(Catalog.user_id == user_id)), 200
 
-    return jsonify([
-        {
-            "id": catalog.id,
-            "name": catalog.name,
-            "comment": catalog.comment,
-            "isPrivate": catalog.is_private,
-            "imageUrl": catalog.image_url,
-            "created_date": catalog.created_date.isoformat(),
-            "updated_date": catalog.updated_date.isoformat(),
-        }
-        for catalog in catalogs
-    ]), 200
+
+@catalogs.route("/search", methods=["GET"])
+@read_replica
+def search_public_catalogs():
+    query_text = request.args.get("q", "").strip()
+    if not query_text:
+        return jsonify({"error": 'Search query parameter "q" is required'}), 400
+
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("pageSize", SEARCH_PAGE_SIZE, type=int)
+
+    return jsonify(search_catalogs(query_text, page, page_size)), 200
+
+
+def find_viewable_catalog(catalog_id, user_id):
+    catalog = Catalog.query.filter_by(id=catalog_id).first()
+    if not catalog:
+        return None, (jsonify({ "message": "Catalog not found"}), 404)
+
+    if (catalog.is_private and str(catalog.user_id) != user_id):
+        return None, (jsonify({ "message": "User does not have permission to view this catalog."}), 403)
+
+    return catalog, None
 
 
 @catalogs.route("/<int:catalog_id>", methods=["GET"])
 @jwt_required(optional=True)
+@read_replica
 def get_catalog(catalog_id):
-    user_id = get_jwt_identity()
-    catalog = Catalog.query.filter_by(id=catalog_id).first()
-    if not catalog:
-        return jsonify({ "message": "Catalog not found"})
-
-    if (catalog.is_private and catalog.user_id != user_id):
-        return jsonify({ "message": "User does not have permission to view this catalog."}), 403
-
-    catalog_items_query = CatalogItem.query.with_entities(
-        CatalogItem.id.label("catalog_item_id"),
-        CatalogItem.spotify_id.label("catalog_item_spotify_id"),
-        CatalogItem.position,
-        CatalogItem.comment,
-        CatalogItem.created_date,
-        CatalogItem.updated_date,
-        Artist.id.label("artist_id"),
-        Artist.spotify_id.label("artist_spotify_id"),
-        Artist.title.label("artist_title"),
-        Artist.image_url_640px.label("artist_image_url_640px"),
-        Artist.image_url_320px.label("artist_image_url_320px"),
-        Artist.image_url_160px.label("artist_image_url_160px"),
-        Album.id.label("album_id"),
-        Album.spotify_id.label("album_spotify_id"),
-        Album.title.label("album_title"),
-        Album.album_type,
-        Album.total_tracks,
-        Album.release_date,
-        Album.image_url_640px.label("album_image_url_640px"),
-        Album.image_url_300px.label("album_image_url_300px"),
-        Album.image_url_64px.label("album_image_url_64px"),
-        Track.id.label("track_id"),
-        Track.spotify_id.label("track_spotify_id"),
-        Track.title.label("track_title"),
-        Track.disc_number,
-        Track.track_order,
-        Track.duration_ms,
-        Track.explicit,
-    ).join(
-        ArtistAlbumTrack, CatalogItem.spotify_id == ArtistAlbumTrack.spotify_id
-    ).join(
-        Artist, ArtistAlbumTrack.artist_id == Artist.id
-    ).outerjoin(
-        Album, ArtistAlbumTrack.album_id == Album.id
-    ).outerjoin(
-        Track, ArtistAlbumTrack.track_id == Track.id
-    ).filter(
-        CatalogItem.catalog_id == catalog_id
-    ).order_by(
-        asc(CatalogItem.position),
-        asc(CatalogItem.created_date)
-    ).all()
-
-    catalog_items = [
-        {
-            "id": row.catalog_item_id,
-            "spotify_id": row.catalog_item_spotify_id,
-            "position": row.position,
-            "comment": row.comment,
-            "created_date": row.created_date,
-            "updated_date": row.updated_date,
-            "artist": {
-                "id": row.artist_id,
-                "spotify_id": row.artist_spotify_id,
-                "title": row.artist_title,
-                "image_url_640px": row.artist_image_url_640px,
-                "image_url_320px": row.artist_image_url_320px,
-                "image_url_160px": row.artist_image_url_160px,
-            },
-            "album": None if row.album_id is None else {
-                "id": row.album_id,
-                "spotify_id": row.album_spotify_id,
-                "title": row.album_title,
-                "album_type": row.album_type,
-                "total_tracks": row.total_tracks,
-                "release_date": row.release_date,
-                "image_url_640px": row.album_image_url_640px,
-                "image_url_300px": row.album_image_url_300px,
-                "image_url_64px": row.album_image_url_64px,
-            },
-            "track": None if row.track_id is None else {
-                "id": row.track_id,
-                "spotify_id": row.track_spotify_id,
-                "title": row.track_title,
-                "disc_number": row.disc_number,
-                "track_order": row.track_order,
-                "duration_ms": row.duration_ms,
-                "explicit": row.explicit,
-            }
-        }
-        for row in catalog_items_query
-    ]
-
-    return jsonify({
-        "id": catalog.id,
-        "name": catalog.name,
-        "comment": catalog.comment,
-        "isPrivate": catalog.is_private,
-        "created_date": catalog.created_date.isoformat(),
-        "updated_date": catalog.updated_date.isoformat(),
-        "items": catalog_items
-    }), 200
+    catalog, error = find_viewable_catalog(catalog_id, get_jwt_identity())
+    if error:
+        return error
+
+    etag = catalog_etag(catalog)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        document = get_or_build_version("catalog", catalog.id, etag, None, lambda: build_catalog_document(catalog))
+        response = Response(document, mimetype="application/json")
+
+    # clients keep the copy but must revalidate it; private catalogs stay out of shared caches
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache" if catalog.is_private else "no-cache"
+    return response
+
+
+@catalogs.route("/<int:catalog_id>/header", methods=["GET"])
+@jwt_required(optional=True)
+@read_replica
+def get_catalog_header(catalog_id):
+    catalog, error = find_viewable_catalog(catalog_id, get_jwt_identity())
+    if error:
+        return error
+
+    return jsonify(serialize_catalog_header(catalog)), 200
+
+
+@catalogs.route("/<int:catalog_id>/items", methods=["GET"])
+@jwt_required(optional=True)
+@read_replica
+def get_catalog_items(catalog_id):
+    catalog, error = find_viewable_catalog(catalog_id, get_jwt_identity())
+    if error:
+        return error
+
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", CATALOG_ITEMS_PAGE_SIZE, type=int)
+    # ?view=summary skips the metadata joins and returns each item's display snapshot
+    summary = request.args.get("view") == "summary"
+
+    try:
+        page = catalog_items_page(catalog.id, cursor, limit, summary=summary)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify(page), 200
+
+
+@catalogs.route("/<int:catalog_id>/sync", methods=["GET"])
+@jwt_required(optional=True)
+@read_replica
+def sync_catalog(catalog_id):
+    catalog, error = find_viewable_catalog(catalog_id, get_jwt_identity())
+    if error:
+        return error
+
+    since = request.args.get("since")
+    try:
+        changes = catalog_changes(catalog, decode_sync_token(since) if since else None)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify(changes), 200
 
 
 @catalogs.route("/user/<int:user_id>", methods=["GET"])
+@read_replica
 def get_user_public_catalogs(user_id):
-    catalogs = Catalog.query.filter_by(user_id=user_id, is_private=False).all()
-
-    return jsonify([
-        {
-            "id": catalog.id,
-            "name": catalog.name,
-            "comment": catalog.comment,
-            "isPrivate": catalog.is_private,
-            "imageUrl": catalog.image_url,
-            "created_date": catalog.created_date.isoformat(),
-            "updated_date": catalog.updated_date.isoformat(),
-        }
-        for catalog in catalogs
-    ]), 200
+    return jsonify(catalog_listing(Catalog.user_id == user_id, Catalog.is_private.is_(False))), 200
+
+
+@catalogs.route("/<int:catalog_id>/fork", methods=["POST"])
+@jwt_required()
+def fork_catalog_for_user(catalog_id):
+    user_id = get_jwt_identity()
+    source, error = find_viewable_catalog(catalog_id, user_id)
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+
+    catalog = fork_catalog(
+        source,
+        user_id,
+        name=data.get("name"),
+        comment=data.get("comment"),
+        is_private=data.get("isPrivate", False),
+    )
+    if not catalog.is_private:
+        record_activity(user_id, "catalog", catalog_id=catalog.id)
+    db.session.commit()
+
+    return jsonify({"message": "Catalog forked successfully", "id": catalog.id}), 201
 
 
 @catalogs.route("/<int:catalog_id>", methods=["PUT"])
@@ -214,6 +228,7 @@ def delete_catalog(catalog_id):
         return jsonify({"message": "No matching catalog found for the current user."}), 404
 
     db.session.delete(catalog)
+    remove_activities(catalog_id=catalog.id)
     db.session.commit()
 
     return jsonify({"message": "Catalog deleted successfully"}), 200
@@ -243,10 +258,15 @@ def add_item_to_catalog(catalog_id):
             catalog_id=catalog.id,
             spotify_id=spotify_id,
             spotify_artist_id=spotify_artist_id,
-            position=position,
-            comment=comment
+            position=position if position is not None else next_catalog_position(catalog.id),
+            comment=comment,
+            **item_metadata_for(spotify_id)
         )
         db.session.add(item)
+        touch_catalog(catalog.id)
+        db.session.flush()
+        if not catalog.is_private:
+            record_activity(user_id, "catalog_item", catalog_id=catalog.id, spotify_id=spotify_id)
         db.session.commit()
     except ValueError:
         return jsonify({"error": "Invalid item_type"}), 400
@@ -257,6 +277,31 @@ def add_item_to_catalog(catalog_id):
     return jsonify({"message": "Item added to catalog", "item_id": item.id}), 201
 
 
+@catalogs.route("/<int:catalog_id>/items/batch", methods=["POST"])
+@jwt_required()
+def batch_update_catalog_items(catalog_id):
+    user_id = get_jwt_identity()
+    catalog = Catalog.query.filter_by(id=catalog_id, user_id=user_id).first()
+    if not catalog:
+        return jsonify({"message": "No matching catalog found for the current user."}), 404
+
+    data = request.get_json()
+
+    try:
+        result = apply_catalog_item_operations(catalog, data.get("operations"))
+        if result["added"] and not catalog.is_private:
+            record_activity(user_id, "catalog_items", catalog_id=catalog.id)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Batch conflicts with existing catalog items"}), 409
+
+    return jsonify({"message": "Catalog items updated", **result}), 200
+
+
 @catalogs.route("/item/<int:item_id>", methods=["PUT"])
 @jwt_required()
 def update_catalog_item(item_id):
@@ -276,12 +321,45 @@ def update_catalog_item(item_id):
 
     item.position = data.get("position", item.position)
     item.comment = data.get("comment", item.comment)
+    touch_catalog(item.catalog_id)
 
     db.session.commit()
 
     return jsonify({"message": "Catalog updated successfully"}), 200
 
 
+@catalogs.route("/item/<int:item_id>/move", methods=["POST"])
+@jwt_required()
+def move_item_in_catalog(item_id):
+    user_id = get_jwt_identity()
+    item = CatalogItem.query.join(
+        Catalog, CatalogItem.catalog_id == Catalog.id
+    ).filter(
+        CatalogItem.id == item_id,
+        Catalog.user_id == user_id
+    ).first()
+
+    if not item:
+        return jsonify({"message": "No matching item found for the current user."}), 404
+
+    data = request.get_json()
+    after = data.get("afterItemId") is not None
+    anchor_id = data.get("afterItemId") if after else data.get("beforeItemId")
+    if anchor_id is None:
+        return jsonify({"message": "request must include afterItemId or beforeItemId"}), 400
+    if not is_integer(anchor_id):
+        return jsonify({"message": "afterItemId and beforeItemId must be integers"}), 400
+
+    anchor = CatalogItem.query.filter_by(id=anchor_id, catalog_id=item.catalog_id).first()
+    if not anchor or anchor.id == item.id:
+        return jsonify({"message": "No matching anchor item found in this catalog."}), 404
+
+    rebalanced = move_catalog_item(item, anchor, after)
+    db.session.commit()
+
+    return jsonify({"message": "Item moved", "position": item.position, "rebalanced": rebalanced}), 200
+
+
 @catalogs.route("/item/<int:item_id>", methods=["DELETE"])
 @jwt_required()
 def remove_item_from_catalog(item_id):
@@ -296,52 +374,23 @@ def remove_item_from_catalog(item_id):
     if not item:
         return jsonify({"message": "No matching item found for the current user."}), 404
 
+    record_catalog_item_tombstones(CatalogItem.id == item.id)
     db.session.delete(item)
+    touch_catalog(item.catalog_id)
     db.session.commit()
 
     return jsonify({"message": "Item removed from catalog"}), 200
 
 
-def get_artist_catalogs():
-    print('todo')
-    # catalogs
-    # sorted_catalogs_query = (
-    #     db.session.query(
-    #         CatalogItem.id.label("catalog_item_id"),
-    #         CatalogItem.spotify_id.label("catalog_item_spotify_id"),
-    #         Catalog.id.label("catalog_id"),
-    #         Catalog.user_id,
-    #         Catalog.upvotes,
-    #         Catalog.downvotes,
-    #         Catalog.created_date,
-    #         Catalog.updated_date,
-    #         Catalog.comment,
-    #         Catalog.image_url,
-    #         Catalog.name,
-    #     ).join(
-    #         Catalog, CatalogItem.catalog_id == Catalog.id
-    #     ).filter(
-    #         CatalogItem.spotify_artist_id == spotify_artist_id,
-    #         Catalog.is_private == False
-    #     ).order_by(
-    #         desc(Catalog.upvotes),
-    #         desc(Catalog.created_date)
-    #     )
-    # )
-    # catalogs = defaultdict(list)
-    # for catalog in sorted_catalogs_query:
-    #     catalogs[catalog.catalog_item_spotify_id].append({
-    #         "catalogItemId": catalog.catalog_item_id,
-    #         "catalogItemSpotifyId": catalog.catalog_item_spotify_id,
-    #         "catalogId": catalog.catalog_id,
-    #         "userId": catalog.user_id,
-    #         "upvotes": catalog.upvotes,
-    #         "downvotes": catalog.downvotes,
-    #         "createdDate": catalog.created_date,
-    #         "updatedDate": catalog.updated_date,
-    #         "comment": catalog.comment,
-    #         "imageUrl": catalog.image_url,
-    #         "name": catalog.name
-    #     })
-
-    # catalogs_dict = dict(catalogs)
+@catalogs.route("/artist/<spotify_artist_id>", methods=["GET"])
+@read_replica
+def get_artist_catalogs(spotify_artist_id):
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", ARTIST_CATALOGS_PAGE_SIZE, type=int)
+
+    try:
+        page = artist_catalogs_page(spotify_artist_id, cursor, limit)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify(page), 200
@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.util.feed import FEED_PAGE_SIZE, get_feed_page
+from app.util.replicas import read_replica
+
+
+feed = Blueprint("feed", __name__)
+
+
+@feed.route("/", methods=["GET"])
+@jwt_required()
+@read_replica
+def get_feed():
+    user_id = get_jwt_identity()
+    cursor = request.args.get("cursor", type=int)
+    limit = request.args.get("limit", FEED_PAGE_SIZE, type=int)
+
+    return jsonify(get_feed_page(user_id, cursor, limit)), 200
@@ -0,0 +1,25 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.util.metrics import render_metrics
+import app.util.db_pool  # registers the pool metrics
+import app.util.request_metrics  # registers the request metrics
+import app.util.sql_profile  # registers the sql profile metrics
+import hmac
+
+
+internal = Blueprint("internal", __name__)
+
+
+@internal.before_request
+def require_metrics_access():
+    # fails closed: behind a proxy on the same host every request looks like localhost,
+    # so the address can't stand in for a token
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+
+@internal.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,10 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Review, User
-from datetime import datetime
-from app.util.spotify import validate_item_in_database
-from collections import defaultdict
-from sqlalchemy.sql import desc
+from app.models import db, Review
+from datetime import datetime, timezone
+from app.util.bulk import REVIEW_UPDATE_FIELDS, export_review_records, import_review_records, iter_ndjson
+from app.util.cache import get_or_build
+from app.util.feed import record_activity, remove_activities
+from app.util.item_metadata import item_metadata_for
+from app.util.review_listing import (
+    REVIEW_LISTING_PAGE_SIZE,
+    artist_public_reviews_query,
+    bump_review_listing_versions,
+    clamp_listing_page,
+    encode_grouped_reviews,
+    paginate_listing,
+    user_public_reviews_query,
+)
+from app.util.query import get_current_user_review_changes, record_review_tombstones
+from app.util.replicas import read_replica
+from app.util.search import SEARCH_PAGE_SIZE, search_reviews
+from app.util.spotify import validate_items_in_database
+from app.util.sync import decode_sync_token
+from app.util.upsert import dialect_insert
+from sqlalchemy import update
 
 
 reviews = Blueprint("reviews", __name__)
@@ -13,40 +30,111 @@ reviews = Blueprint("reviews", __name__)
 # todo: upvote / downvote functionality
 
 
+def review_insert(user_id, data):
+    now = datetime.now(timezone.utc)
+
+    return dialect_insert(Review).values(
+        user_id=user_id,
+        is_private=data.get('isPrivate', True),
+        rating=data.get('rating'),
+        comment=data.get('comment'),
+        spotify_id=data.get('spotifyId'),
+        spotify_artist_id=data.get('spotifyArtistId'),
+        created_date=now,
+        updated_date=now,
+        **item_metadata_for(data.get('spotifyId')),
+    )
+
+
+def after_review_write(user_id, review_id, data, activity_type):
+    if data.get('isPrivate', True) is False:
+        if activity_type == "review_updated":
+            # followers see a review once, at its latest edit, rather than once per save
+            remove_activities(review_id=review_id)
+        record_activity(user_id, activity_type, review_id=review_id, spotify_id=data.get('spotifyId'))
+    bump_review_listing_versions(user_id, data.get('spotifyArtistId'))
+
+
 @reviews.route("/", methods=["POST"])
 @jwt_required()
 def create_review():
     user_id = get_jwt_identity()
     data = request.get_json()
 
-    comment = data.get('comment')
-    is_private = data.get('isPrivate')
-    rating = data.get('rating')
     spotify_artist_id = data.get('spotifyArtistId')
     spotify_id = data.get('spotifyId')
 
-    try:
-        validate_item_in_database(spotify_id, spotify_artist_id)
-    except Exception as e:
-        return jsonify({'message': 'error validating item in database'}), 500
+    if not validate_items_in_database([(spotify_id, spotify_artist_id)]):
+        return jsonify({'message': 'error validating item in database'}), 400
 
-    existing_review = Review.query.filter_by(user_id=user_id, spotify_id=spotify_id).first()
-    if existing_review:
+    # the (user_id, spotify_id) unique constraint decides conflicts, so concurrent creates can't both succeed
+    review_id = db.session.execute(
+        review_insert(user_id, data).on_conflict_do_nothing(
+            index_elements=[Review.user_id, Review.spotify_id]
+        ).returning(Review.id)
+    ).scalar()
+
+    if review_id is None:
+        db.session.rollback()
         return jsonify({"message": "User review for this item already exists. Use the PUT endpoint instead."}), 409
 
-    review = Review(
-        user_id=user_id,
-        is_private=is_private,
-        rating=rating,
-        comment=comment,
-        spotify_id=spotify_id,
-        spotify_artist_id=spotify_artist_id
-    )
+    after_review_write(user_id, review_id, data, "review")
+    db.session.commit()
+
+    return jsonify({"message": "Review created successfully", "id": review_id}), 201
+
+
+@reviews.route("/", methods=["PUT"])
+@jwt_required()
+def upsert_review():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    spotify_artist_id = data.get('spotifyArtistId')
+    spotify_id = data.get('spotifyId')
 
-    db.session.add(review)
+    if not validate_items_in_database([(spotify_id, spotify_artist_id)]):
+        return jsonify({'message': 'error validating item in database'}), 400
+
+    review_id = db.session.execute(
+        review_insert(user_id, data).on_conflict_do_nothing(
+            index_elements=[Review.user_id, Review.spotify_id]
+        ).returning(Review.id)
+    ).scalar()
+
+    if review_id is not None:
+        after_review_write(user_id, review_id, data, "review")
+        db.session.commit()
+        return jsonify({"message": "Review created successfully", "id": review_id}), 201
+
+    # the review already exists; like PUT /<review_id>, fields left out of the body keep their values
+    changes = {
+        column: data[key]
+        for key, column in REVIEW_UPDATE_FIELDS
+        if key in data
+    }
+    row = db.session.execute(
+        update(Review).where(
+            Review.user_id == user_id,
+            Review.spotify_id == spotify_id,
+        ).values(
+            **changes,
+            updated_date=datetime.now(timezone.utc),
+            **item_metadata_for(spotify_id),
+        ).returning(Review.id, Review.is_private, Review.spotify_artist_id)
+    ).one_or_none()
+
+    if row is None:
+        # deleted between the insert and the update
+        db.session.rollback()
+        return jsonify({"message": "Review was deleted while being updated, try again."}), 409
+
+    after_review_write(
+        user_id, row.id, {**data, 'isPrivate': row.is_private, 'spotifyArtistId': row.spotify_artist_id}, "review_updated"
+    )
     db.session.commit()
 
-    return jsonify({"message": "Review created successfully"}), 201
+    return jsonify({"message": "Review updated successfully", "id": row.id}), 200
 
 
 @reviews.route("/", methods=["GET"])
@@ -74,11 +162,36 @@ def get_current_user_reviews():
     ]), 200
 
 
+@reviews.route("/import", methods=["POST"])
+@jwt_required()
+def import_reviews():
+    user_id = get_jwt_identity()
+
+    on_conflict = request.args.get("onConflict", "skip")
+    if on_conflict not in ("skip", "update"):
+        return jsonify({"message": "onConflict must be either 'skip' or 'update'"}), 400
+
+    summary = import_review_records(user_id, iter_ndjson(request.stream), on_conflict)
+
+    return jsonify(summary), 200
+
+
+@reviews.route("/export", methods=["GET"])
+@jwt_required()
+def export_reviews():
+    user_id = get_jwt_identity()
+
+    return Response(
+        stream_with_context(export_review_records(user_id)),
+        mimetype="application/x-ndjson",
+    )
+
+
 @reviews.route("/<int:review_id>", methods=["PUT"])
 @jwt_required()
 def update_review(review_id):
     user_id = get_jwt_identity()
-    review = Review.query(id=review_id, user_id=user_id).first()
+    review = Review.query.filter_by(id=review_id, user_id=user_id).first()
 
     if not review:
         return jsonify({"message": "No matching review found for the current user."}), 404
@@ -88,8 +201,13 @@ def update_review(review_id):
     review.rating = data.get("rating", review.rating)
     review.comment = data.get("comment", review.comment)
     review.is_private = data.get("isPrivate", review.is_private)
-    review.updated_date = datetime.now()
+    review.updated_date = datetime.now(timezone.utc)
 
+    after_review_write(review.user_id, review.id, {
+        'isPrivate': review.is_private,
+        'spotifyId': review.spotify_id,
+        'spotifyArtistId': review.spotify_artist_id,
+    }, "review_updated")
     db.session.commit()
 
     return jsonify({"message": "Review updated successfully"}), 200
@@ -103,97 +221,68 @@ def delete_review(review_id):
     if str(review.user_id) != user_id:
         return jsonify({"message": "Invalid credentials for the selected review."}), 401
 
+    record_review_tombstones(Review.id == review.id)
     db.session.delete(review)
+    remove_activities(review_id=review.id)
+    bump_review_listing_versions(review.user_id, review.spotify_artist_id)
     db.session.commit()
 
     return jsonify({"message": "Review deleted successfully"}), 200
 
 
-# todo: join on user table for user data
+@reviews.route("/sync", methods=["GET"])
+@jwt_required()
+def sync_current_user_reviews():
+    user_id = get_jwt_identity()
+
+    since = request.args.get("since")
+    try:
+        changes = get_current_user_review_changes(user_id, decode_sync_token(since) if since else None)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify(changes), 200
+
+
+@reviews.route("/search", methods=["GET"])
+@read_replica
+def search_public_reviews():
+    query_text = request.args.get("q", "").strip()
+    if not query_text:
+        return jsonify({"error": 'Search query parameter "q" is required'}), 400
+
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("pageSize", SEARCH_PAGE_SIZE, type=int)
+
+    return jsonify(search_reviews(query_text, page, page_size)), 200
+
+
 # todo: sort so user reviews are at the top
 @reviews.route("/artist/<artist_id>", methods=["GET"])
+@read_replica
 def get_artist_reviews(artist_id):
-    sorted_reviews_query = (
-        db.session.query(
-            Review.id.label("review_id"),
-            Review.spotify_id,
-            Review.user_id,
-            Review.comment,
-            Review.rating,
-            Review.created_date,
-            Review.updated_date,
-            Review.upvotes,
-            Review.is_private,
-            User.username,
-            User.display_name,
-        ).join(
-            User, Review.user_id == User.id
-        ).filter(
-            Review.spotify_artist_id == artist_id,
-            Review.is_private is False,
-        ).order_by(
-            desc(Review.upvotes),
-            desc(Review.created_date),
-        )
+    # clamped before they go into the cache key, so out of range values share an entry
+    # and every request for the whole listing shares one
+    page, page_size = clamp_listing_page(
+        request.args.get("page", type=int),
+        request.args.get("pageSize", REVIEW_LISTING_PAGE_SIZE, type=int),
     )
-    reviews = defaultdict(list)
-    for review in sorted_reviews_query:
-        reviews[review.spotify_id].append({
-            "spotifyId": review.spotify_id,
-            "reviewId": review.review_id,
-            "userId": review.user_id,
-            "comment": review.comment,
-            "rating": review.rating,
-            "createdDate": review.created_date,
-            "updatedDate": review.updated_date,
-            "upvotes": review.upvotes,
-            "username": review.username,
-            "displayName": review.display_name,
-        })
-    reviews_dict = dict(reviews)
-    return jsonify(reviews_dict), 200
+
+    body = get_or_build("artist_reviews", artist_id, (page, page_size), lambda: encode_grouped_reviews(
+        paginate_listing(artist_public_reviews_query(artist_id), page, page_size)
+    ))
+    return Response(body, mimetype="application/json"), 200
 
 
-@reviews.route("/user/<user_id>", methods=["GET"])
+@reviews.route("/user/<int:user_id>", methods=["GET"])
+@read_replica
 def get_user_reviews_public(user_id):
-    sorted_reviews_query = (
-        db.session.query(
-            Review.id.label("review_id"),
-            Review.spotify_id,
-            Review.user_id,
-            Review.comment,
-            Review.rating,
-            Review.created_date,
-            Review.updated_date,
-            Review.upvotes,
-            Review.is_private,
-            User.username,
-            User.display_name,
-        ).join(
-            User, Review.user_id == User.id
-        ).filter(
-            Review.user_id == user_id,
-            Review.is_private is False,
-        ).order_by(
-            desc(Review.created_date),
-        )
+    page, page_size = clamp_listing_page(
+        request.args.get("page", type=int),
+        request.args.get("pageSize", REVIEW_LISTING_PAGE_SIZE, type=int),
     )
 
-    reviews = defaultdict(list)
-    for review in sorted_reviews_query:
-        reviews[review.spotify_id].append({
-            "spotifyId": review.spotify_id,
-            "reviewId": review.review_id,
-            "userId": review.user_id,
-            "comment": review.comment,
-            "rating": review.rating,
-            "createdDate": review.created_date,
-            "updatedDate": review.updated_date,
-            "upvotes": review.upvotes,
-            "username": review.username,
-            "displayName": review.display_name,
-        })
-
-    reviews_dict = dict(reviews)
-    
-    return jsonify(reviews_dict), 200
+    body = get_or_build("user_reviews", user_id, (page, page_size), lambda: encode_grouped_reviews(
+        paginate_listing(user_public_reviews_query(user_id), page, page_size)
+    ))
+    return Response(body, mimetype="application/json"), 200
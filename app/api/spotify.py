@@ -1,10 +1,9 @@
 from flask import Blueprint, current_app, jsonify, redirect, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User
+from flask_jwt_extended import jwt_required
 from app import db
 from datetime import datetime, timedelta, timezone
-import requests
-from app.util.spotify import get_user_token, get_client_token
+from app.util.identity import current_user
+from app.util.spotify import get_user_token, get_client_token, spotify_http
 
 
 spotify = Blueprint('spotify', __name__)
@@ -14,7 +13,7 @@ spotify = Blueprint('spotify', __name__)
 @jwt_required()
 def spotify_login():
     auth_url = (
-        f"https://accounts.spotify.com/authorize"
+        f"{current_app.config['SPOTIFY_ACCOUNTS_URL']}/authorize"
         f"?response_type=code"
         f"&client_id={current_app.config['SPOTIFY_CLIENT_ID']}"
         f"&redirect_uri={current_app.config['SPOTIFY_REDIRECT_URI']}"
@@ -30,7 +29,7 @@ def spotify_callback():
     if not code:
         return jsonify({'error': 'Authorization code missing'}), 400
 
-    token_url = 'https://accounts.spotify.com/api/token'
+    token_url = f"{current_app.config['SPOTIFY_ACCOUNTS_URL']}/api/token"
     token_data = {
         'grant_type': 'authorization_code',
         'code': code,
@@ -39,14 +38,13 @@ def spotify_callback():
         'client_secret': current_app.config['SPOTIFY_CLIENT_SECRET'],
     }
 
-    response = requests.post(token_url, data=token_data)
+    response = spotify_http.post(token_url, data=token_data)
     token_info = response.json()
 
     if response.status_code != 200:
         return jsonify({'error': 'Failed to exchange code for token', 'details': token_info}), 400
 
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
@@ -61,8 +59,7 @@ def spotify_callback():
 @spotify.route('/user', methods=['GET'])
 @jwt_required()
 def get_user_profile():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
@@ -72,7 +69,7 @@ def get_user_profile():
         return jsonify({'error': str(e)}), 400
 
     headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get('https://api.spotify.com/v1/me', headers=headers)
+    response = spotify_http.get(f"{current_app.config['SPOTIFY_API_URL']}/me", headers=headers)
     return response.json(), response.status_code
 
 
@@ -86,8 +83,8 @@ def search_spotify():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-    response = requests.get(
-        'https://api.spotify.com/v1/search',
+    response = spotify_http.get(
+        f"{current_app.config['SPOTIFY_API_URL']}/search",
         headers={'Authorization': f'Bearer {access_token}'},
         params={
             'q': request.args.get('q'),
@@ -180,8 +177,8 @@ def fetch_artist_profile():
         return jsonify({'error': str(e)}), 400
 
     # artist data
-    response = requests.get(
-        f'https://api.spotify.com/v1/artists/{request.args.get('id')}',
+    response = spotify_http.get(
+        f"{current_app.config['SPOTIFY_API_URL']}/artists/{request.args.get('id')}",
         headers={'Authorization': f'Bearer {access_token}'},
     )
     if response.status_code != 200:
@@ -190,8 +187,8 @@ def fetch_artist_profile():
         artist_response = response.json()
 
     # artist albums
-    response = requests.get(
-        f'https://api.spotify.com/v1/artists/{request.args.get('id')}/albums',
+    response = spotify_http.get(
+        f"{current_app.config['SPOTIFY_API_URL']}/artists/{request.args.get('id')}/albums",
         headers={'Authorization': f'Bearer {access_token}'},
         params={
             'market': 'US',
@@ -210,8 +207,8 @@ def fetch_artist_profile():
         # spotify limits requests to <=20 ids
         batch_ids = ','.join(album_ids[i:i+20])
 
-        response = requests.get(
-            'https://api.spotify.com/v1/albums',
+        response = spotify_http.get(
+            f"{current_app.config['SPOTIFY_API_URL']}/albums",
             headers={'Authorization': f'Bearer {access_token}'},
             params={'ids': batch_ids, 'market': 'US'}
         )
@@ -1,13 +1,24 @@
-from flask import Blueprint, jsonify
-from app.models import User
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import db, Follow, User
+from app.util.feed import backfill_feed, clear_followee_from_feed
+from app.util.identity import invalidate_user
+from app.util.query import get_public_user
+from app.util.replicas import read_replica
+from app.util.review_listing import REVIEW_LISTING_PAGE_SIZE
+from app.util.upsert import dialect_insert
+from sqlalchemy import delete
 
 
 user = Blueprint("user", __name__)
 
 
 @user.route("/<int:user_id>", methods=['GET'])
+@read_replica
 def get_user(user_id):
     user = User.query.filter_by(id=user_id).first()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
 
     return jsonify({
         "userId": user.id,
@@ -15,3 +26,68 @@ def get_user(user_id):
         "displayName": user.display_name,
         "profilePicUrl": user.profile_pic_url
     }), 200
+
+
+@user.route("/<int:user_id>/profile", methods=['GET'])
+@read_replica
+def get_user_public_profile(user_id):
+    reviews_page_size = request.args.get("reviewsPageSize", REVIEW_LISTING_PAGE_SIZE, type=int)
+
+    profile = get_public_user(user_id, reviews_page_size)
+    if not profile:
+        return jsonify({"message": "User not found"}), 404
+
+    return jsonify(profile), 200
+
+
+@user.route("/<int:user_id>/follow", methods=['POST'])
+@jwt_required()
+def follow_user(user_id):
+    follower_id = int(get_jwt_identity())
+    if follower_id == user_id:
+        return jsonify({"message": "Users cannot follow themselves."}), 400
+
+    if not User.query.filter_by(id=user_id).first():
+        return jsonify({"message": "User not found"}), 404
+
+    # the primary key decides concurrent follows, so only the one that inserts bumps the count
+    followed = db.session.execute(
+        dialect_insert(Follow).values(
+            follower_id=follower_id,
+            followee_id=user_id,
+        ).on_conflict_do_nothing(
+            index_elements=[Follow.follower_id, Follow.followee_id]
+        ).returning(Follow.followee_id)
+    ).scalar()
+    if followed is None:
+        db.session.rollback()
+        return jsonify({"message": "Already following this user"}), 200
+
+    User.query.filter_by(id=user_id).update({User.follower_count: User.follower_count + 1})
+    backfill_feed(follower_id, user_id)
+    db.session.commit()
+    invalidate_user(user_id)
+
+    return jsonify({"message": "User followed successfully"}), 201
+
+
+@user.route("/<int:user_id>/follow", methods=['DELETE'])
+@jwt_required()
+def unfollow_user(user_id):
+    follower_id = int(get_jwt_identity())
+    unfollowed = db.session.execute(
+        delete(Follow).where(
+            Follow.follower_id == follower_id,
+            Follow.followee_id == user_id,
+        )
+    ).rowcount
+    if not unfollowed:
+        db.session.rollback()
+        return jsonify({"message": "Not following this user"}), 404
+
+    User.query.filter_by(id=user_id).update({User.follower_count: User.follower_count - 1})
+    clear_followee_from_feed(follower_id, user_id)
+    db.session.commit()
+    invalidate_user(user_id)
+
+    return jsonify({"message": "User unfollowed successfully"}), 200
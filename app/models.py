@@ -1,6 +1,7 @@
 from . import db
 from datetime import datetime, timezone
 from enum import Enum
+from sqlalchemy import DDL, event
 
 
 # class CatalogItemType(Enum):
@@ -29,6 +30,7 @@ class User(db.Model):
     spotify_token_expires = db.Column(
         db.DateTime(timezone=True),
         nullable=True)
+    follower_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
 
 class Album(db.Model):
@@ -91,6 +93,10 @@ class Catalog(db.Model):
 
 class CatalogItem(db.Model):
     __tablename__ = 'catalog_items'
+    __table_args__ = (
+        db.Index('ix_catalog_items_catalog_id_position', 'catalog_id', 'position', 'created_date', 'id'),
+        db.Index('ix_catalog_items_spotify_artist_id', 'spotify_artist_id', 'catalog_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     catalog_id = db.Column(
@@ -110,6 +116,11 @@ class CatalogItem(db.Model):
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc),
         nullable=False)
+    # display snapshot, see app.util.item_metadata
+    item_type = db.Column(db.String(16), nullable=True)
+    item_title = db.Column(db.String(120), nullable=True)
+    item_artist_name = db.Column(db.String(120), nullable=True)
+    item_image_url = db.Column(db.String(512), nullable=True)
 
     catalog = db.relationship('Catalog', back_populates='items')
 
@@ -117,6 +128,10 @@ class CatalogItem(db.Model):
 # todo: track user review history over time
 class Review(db.Model):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'spotify_id', name='uq_reviews_user_id_spotify_id'),
+        db.Index('ix_reviews_user_id_updated_date', 'user_id', 'updated_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -136,6 +151,11 @@ class Review(db.Model):
     is_private = db.Column(db.Boolean, default=True)
     upvotes = db.Column(db.Integer, default=0)
     downvotes = db.Column(db.Integer, default=0)
+    # display snapshot, see app.util.item_metadata
+    item_type = db.Column(db.String(16), nullable=True)
+    item_title = db.Column(db.String(120), nullable=True)
+    item_artist_name = db.Column(db.String(120), nullable=True)
+    item_image_url = db.Column(db.String(512), nullable=True)
 
 
 class Track(db.Model):
@@ -160,3 +180,129 @@ class ArtistAlbumTrack(db.Model):
     album_id = db.Column(db.Integer, db.ForeignKey('albums.id'), nullable=True)
     track_id = db.Column(db.Integer, db.ForeignKey('tracks.id'), nullable=True)
     spotify_id = db.Column(db.String(128), unique=True, nullable=True, index=True)
+
+
+# version counters for cached listings, bumped in the same transaction as the write
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+
+    key = db.Column(db.String(256), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Follow(db.Model):
+    __tablename__ = 'follows'
+
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    followee_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, index=True)
+    created_date = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False)
+
+
+class Activity(db.Model):
+    __tablename__ = 'activities'
+    __table_args__ = (
+        db.Index('ix_activities_actor_id_id', 'actor_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    activity_type = db.Column(db.String(32), nullable=False)
+    review_id = db.Column(db.Integer, nullable=True, index=True)
+    catalog_id = db.Column(db.Integer, nullable=True, index=True)
+    spotify_id = db.Column(db.String(128), nullable=True)
+    # false when the author had too many followers to fan out to; read-time merges these in
+    fanned_out = db.Column(db.Boolean, default=True, nullable=False)
+    created_date = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False)
+
+
+class FeedItem(db.Model):
+    __tablename__ = 'feed_items'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    activity_id = db.Column(
+        db.Integer,
+        db.ForeignKey('activities.id', ondelete='CASCADE'),
+        primary_key=True)
+
+
+# deleted rows, kept so delta sync can tell clients what to drop. parent_id scopes the
+# lookup (the catalog for catalog items); rows older than the retention window are pruned.
+class Tombstone(db.Model):
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_entity_parent_id_deleted_date', 'entity', 'parent_id', 'deleted_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    parent_id = db.Column(db.Integer, nullable=False)
+    spotify_id = db.Column(db.String(128), nullable=True)
+    deleted_date = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False)
+
+
+# full-text search lives outside the mapped columns: a generated tsvector + GIN index on
+# postgres, and an external-content fts5 table kept current by triggers on sqlite.
+# app.util.search queries both; the migration that adds them mirrors these statements.
+SEARCH_INDEXED_COLUMNS = {
+    'reviews': ('comment',),
+    'catalogs': ('name', 'comment'),
+    'catalog_items': ('comment',),
+}
+
+
+def sqlite_search_trigger_ddl(table_name, columns):
+    # the triggers that keep {table_name}_fts in step with the table, then a reindex of
+    # the rows already there. sqlite drops the triggers whenever the table itself is
+    # rebuilt, so migrations that rebuild an indexed table run these again afterwards.
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    fts = f'{table_name}_fts'
+
+    return [
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table_name} BEGIN '
+        f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table_name} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {column_list} ON {table_name} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def search_index_ddl(table_name, columns):
+    weighted = ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({column}, '')), '{'ABCD'[i]}')"
+        for i, column in enumerate(columns)
+    )
+
+    return {
+        'postgresql': [
+            f'ALTER TABLE {table_name} ADD COLUMN search_vector tsvector '
+            f'GENERATED ALWAYS AS ({weighted}) STORED',
+            f'CREATE INDEX ix_{table_name}_search_vector ON {table_name} USING GIN (search_vector)',
+        ],
+        'sqlite': [
+            f"CREATE VIRTUAL TABLE {table_name}_fts USING fts5({', '.join(columns)}, "
+            f"content='{table_name}', content_rowid='id')",
+            *sqlite_search_trigger_ddl(table_name, columns),
+        ],
+    }
+
+
+for _table in (Review.__table__, Catalog.__table__, CatalogItem.__table__):
+    for _dialect, _statements in search_index_ddl(_table.name, SEARCH_INDEXED_COLUMNS[_table.name]).items():
+        for _statement in _statements:
+            event.listen(_table, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+    event.listen(_table, 'after_drop', DDL(f'DROP TABLE IF EXISTS {_table.name}_fts').execute_if(dialect='sqlite'))
@@ -0,0 +1,164 @@
+from flask import current_app
+from app import db
+from app.models import Review
+from app.util.item_metadata import ITEM_METADATA_COLUMNS, item_metadata
+from app.util.review_listing import bump_review_listing_versions
+from app.util.query import serialize_review
+from app.util.spotify import validate_items_in_database
+from app.util.upsert import dialect_insert
+from datetime import datetime, timezone
+from sqlalchemy import update
+import json
+
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ERRORS = 100
+EXPORT_YIELD_PER = 1000
+# (record key, column) pairs an update may change
+REVIEW_UPDATE_FIELDS = (("rating", "rating"), ("comment", "comment"), ("isPrivate", "is_private"))
+
+
+def iter_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def add_import_error(summary, line_number, message):
+    # a large bad upload reports its first errors and a count of the rest
+    if len(summary["errors"]) < IMPORT_MAX_ERRORS:
+        summary["errors"].append({"line": line_number, "message": message})
+    else:
+        summary["errorsOmitted"] += 1
+
+
+def import_review_records(user_id, records, on_conflict="skip", batch_size=IMPORT_BATCH_SIZE):
+    summary = {"created": 0, "updated": 0, "skipped": 0, "errors": [], "errorsOmitted": 0}
+
+    batch = []
+    for line_number, record in records:
+        if not isinstance(record, dict):
+            add_import_error(summary, line_number, "Line is not a valid JSON object")
+            continue
+
+        batch.append((line_number, record))
+        if len(batch) >= batch_size:
+            _import_review_batch(user_id, batch, on_conflict, summary)
+            batch = []
+
+    if batch:
+        _import_review_batch(user_id, batch, on_conflict, summary)
+
+    return summary
+
+
+def _import_review_batch(user_id, batch, on_conflict, summary):
+    # the last line for an item wins if it appears more than once in a batch
+    records = {}
+    for line_number, record in batch:
+        spotify_id = record.get("spotifyId")
+        if not spotify_id or not record.get("spotifyArtistId"):
+            add_import_error(summary, line_number, "Line must include spotifyId and spotifyArtistId")
+            continue
+
+        if spotify_id in records:
+            summary["skipped"] += 1
+        records[spotify_id] = (line_number, record)
+
+    if not records:
+        return
+
+    valid_items = validate_items_in_database(
+        (spotify_id, record.get("spotifyArtistId")) for spotify_id, (_, record) in records.items()
+    )
+    existing_reviews = dict(
+        db.session.query(Review.spotify_id, Review.id).filter(
+            Review.user_id == user_id,
+            Review.spotify_id.in_(records.keys()),
+        ).all()
+    )
+
+    metadata = item_metadata(spotify_id for spotify_id, _ in valid_items)
+    missing_metadata = dict.fromkeys(ITEM_METADATA_COLUMNS)
+
+    now = datetime.now(timezone.utc)
+    inserts = []
+    updates = []
+    touched_artists = set()
+    for spotify_id, (line_number, record) in records.items():
+        if (spotify_id, record.get("spotifyArtistId")) not in valid_items:
+            add_import_error(summary, line_number, "error validating item in database")
+            continue
+
+        if spotify_id in existing_reviews:
+            if on_conflict == "update":
+                touched_artists.add(record.get("spotifyArtistId"))
+                # like PUT /, fields left out of the line keep their stored values
+                updates.append({
+                    "id": existing_reviews[spotify_id],
+                    **{column: record[key] for key, column in REVIEW_UPDATE_FIELDS if key in record},
+                    "updated_date": now,
+                })
+            else:
+                summary["skipped"] += 1
+            continue
+
+        touched_artists.add(record.get("spotifyArtistId"))
+        inserts.append({
+            "user_id": user_id,
+            "spotify_id": spotify_id,
+            "spotify_artist_id": record.get("spotifyArtistId"),
+            "rating": record.get("rating"),
+            "comment": record.get("comment"),
+            "is_private": record.get("isPrivate", True),
+            "created_date": now,
+            "updated_date": now,
+            "upvotes": 0,
+            "downvotes": 0,
+            **metadata.get(spotify_id, missing_metadata),
+        })
+
+    created = 0
+    if inserts:
+        # a concurrent write may have created one of these since the lookup above;
+        # those rows aren't returned and count as skipped
+        created = len(db.session.execute(
+            dialect_insert(Review).on_conflict_do_nothing(
+                index_elements=[Review.user_id, Review.spotify_id]
+            ).returning(Review.id),
+            inserts,
+        ).all())
+    if updates:
+        db.session.execute(update(Review), updates)
+    if touched_artists:
+        bump_review_listing_versions(user_id, *touched_artists)
+    db.session.commit()
+
+    summary["created"] += created
+    summary["skipped"] += len(inserts) - created
+    summary["updated"] += len(updates)
+
+
+def export_review_records(user_id, yield_per=EXPORT_YIELD_PER):
+    # yield_per streams from a server-side cursor instead of loading every review up front
+    reviews_query = Review.query.filter_by(
+        user_id=user_id
+    ).order_by(
+        Review.id
+    ).yield_per(yield_per)
+
+    lines = []
+    for review in reviews_query:
+        lines.append(current_app.json.dumps(serialize_review(review)))
+        if len(lines) >= yield_per:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
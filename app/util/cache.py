@@ -0,0 +1,62 @@
+from flask import current_app
+from app import db
+from app.models import CacheVersion
+from app.util.upsert import dialect_insert
+from collections import OrderedDict
+from threading import Lock
+
+
+# serialized responses live in process memory, but the version each one was built
+# against lives in the database, so a write in any worker invalidates every worker's copy
+_responses = OrderedDict()
+_responses_lock = Lock()
+
+
+def cache_key(namespace, key):
+    return f'{namespace}:{key}'
+
+
+def get_cache_version(namespace, key):
+    version = db.session.query(CacheVersion.version).filter(
+        CacheVersion.key == cache_key(namespace, key)
+    ).scalar()
+    return version or 0
+
+
+def bump_cache_versions(*keys):
+    # keys: (namespace, key) pairs. does not commit, so the bump lands with the caller's write
+    for namespace, key in set(keys):
+        statement = dialect_insert(CacheVersion).values(key=cache_key(namespace, key), version=1)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[CacheVersion.key],
+            set_={'version': CacheVersion.version + 1},
+        ))
+
+
+def get_or_build(namespace, key, variant, build):
+    return get_or_build_version(namespace, key, get_cache_version(namespace, key), variant, build)
+
+
+def get_or_build_version(namespace, key, version, variant, build):
+    # for callers that already know a version, e.g. a row's updated_date
+    entry_key = (cache_key(namespace, key), version, variant)
+
+    with _responses_lock:
+        if entry_key in _responses:
+            _responses.move_to_end(entry_key)
+            return _responses[entry_key]
+
+    value = build()
+
+    max_entries = current_app.config['RESPONSE_CACHE_MAX_ENTRIES']
+    with _responses_lock:
+        _responses[entry_key] = value
+        while len(_responses) > max_entries:
+            _responses.popitem(last=False)
+
+    return value
+
+
+def clear_response_cache():
+    with _responses_lock:
+        _responses.clear()
@@ -0,0 +1,621 @@
+from flask import current_app
+from app import db
+from app.models import ArtistAlbumTrack, Artist, Album, Track, Catalog, CatalogItem
+from datetime import datetime, timezone
+from app.util.item_metadata import ITEM_METADATA_COLUMNS, item_metadata
+from app.util.spotify import validate_items_in_database
+from app.util.sync import changed_after, needs_full_sync, record_tombstones, removed_since, sync_token
+from sqlalchemy import and_, asc, delete, desc, func, insert, literal, or_, select, update
+import base64
+import json
+
+
+CATALOG_ITEMS_PAGE_SIZE = 100
+CATALOG_ITEMS_MAX_PAGE_SIZE = 500
+CATALOG_ITEM_ORDER = (
+    asc(CatalogItem.position).nulls_last(),
+    asc(CatalogItem.created_date),
+    asc(CatalogItem.id),
+)
+
+
+def catalog_items_query(catalog_id):
+    return CatalogItem.query.with_entities(
+        CatalogItem.id.label("catalog_item_id"),
+        CatalogItem.spotify_id.label("catalog_item_spotify_id"),
+        CatalogItem.position,
+        CatalogItem.comment,
+        CatalogItem.created_date,
+        CatalogItem.updated_date,
+        Artist.id.label("artist_id"),
+        Artist.spotify_id.label("artist_spotify_id"),
+        Artist.title.label("artist_title"),
+        Artist.image_url_640px.label("artist_image_url_640px"),
+        Artist.image_url_320px.label("artist_image_url_320px"),
+        Artist.image_url_160px.label("artist_image_url_160px"),
+        Album.id.label("album_id"),
+        Album.spotify_id.label("album_spotify_id"),
+        Album.title.label("album_title"),
+        Album.album_type,
+        Album.total_tracks,
+        Album.release_date,
+        Album.image_url_640px.label("album_image_url_640px"),
+        Album.image_url_300px.label("album_image_url_300px"),
+        Album.image_url_64px.label("album_image_url_64px"),
+        Track.id.label("track_id"),
+        Track.spotify_id.label("track_spotify_id"),
+        Track.title.label("track_title"),
+        Track.disc_number,
+        Track.track_order,
+        Track.duration_ms,
+        Track.explicit,
+    ).join(
+        ArtistAlbumTrack, CatalogItem.spotify_id == ArtistAlbumTrack.spotify_id
+    ).join(
+        Artist, ArtistAlbumTrack.artist_id == Artist.id
+    ).outerjoin(
+        Album, ArtistAlbumTrack.album_id == Album.id
+    ).outerjoin(
+        Track, ArtistAlbumTrack.track_id == Track.id
+    ).filter(
+        CatalogItem.catalog_id == catalog_id
+    ).order_by(
+        *CATALOG_ITEM_ORDER
+    )
+
+
+def catalog_item_summaries_query(catalog_id):
+    # reads only catalog_items, using the metadata snapshot instead of the joins above
+    return db.session.query(
+        CatalogItem.id.label("catalog_item_id"),
+        CatalogItem.spotify_id.label("catalog_item_spotify_id"),
+        CatalogItem.spotify_artist_id,
+        CatalogItem.position,
+        CatalogItem.comment,
+        CatalogItem.created_date,
+        CatalogItem.updated_date,
+        CatalogItem.item_type,
+        CatalogItem.item_title,
+        CatalogItem.item_artist_name,
+        CatalogItem.item_image_url,
+    ).filter(
+        CatalogItem.catalog_id == catalog_id
+    ).order_by(
+        *CATALOG_ITEM_ORDER
+    )
+
+
+def catalog_items_page(catalog_id, cursor=None, limit=CATALOG_ITEMS_PAGE_SIZE, summary=False):
+    limit = min(max(limit, 1), CATALOG_ITEMS_MAX_PAGE_SIZE)
+
+    if summary:
+        query, serialize = catalog_item_summaries_query(catalog_id), serialize_catalog_item_summary
+    else:
+        query, serialize = catalog_items_query(catalog_id), serialize_catalog_item_row
+    if cursor is not None:
+        query = query.filter(after_item_cursor(*decode_item_cursor(cursor)))
+
+    rows = query.limit(limit + 1).all()
+
+    return {
+        "items": [serialize(row) for row in rows[:limit]],
+        "nextCursor": encode_item_cursor(rows[limit - 1]) if len(rows) > limit else None,
+    }
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def encode_item_cursor(row):
+    return encode_cursor([row.position, row.created_date.isoformat(), row.catalog_item_id])
+
+
+def decode_item_cursor(cursor):
+    position, created_date, item_id = decode_cursor(cursor, 3)
+    try:
+        return position, datetime.fromisoformat(created_date), int(item_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_item_cursor(position, created_date, item_id):
+    # keyset predicate matching CATALOG_ITEM_ORDER, where unpositioned items sort last
+    later_in_position = or_(
+        CatalogItem.created_date > created_date,
+        and_(CatalogItem.created_date == created_date, CatalogItem.id > item_id),
+    )
+    if position is None:
+        return and_(CatalogItem.position.is_(None), later_in_position)
+
+    return or_(
+        CatalogItem.position > position,
+        and_(CatalogItem.position == position, later_in_position),
+        CatalogItem.position.is_(None),
+    )
+
+
+def serialize_catalog_item_row(row):
+    return {
+        "id": row.catalog_item_id,
+        "spotify_id": row.catalog_item_spotify_id,
+        "position": row.position,
+        "comment": row.comment,
+        "created_date": row.created_date,
+        "updated_date": row.updated_date,
+        "artist": {
+            "id": row.artist_id,
+            "spotify_id": row.artist_spotify_id,
+            "title": row.artist_title,
+            "image_url_640px": row.artist_image_url_640px,
+            "image_url_320px": row.artist_image_url_320px,
+            "image_url_160px": row.artist_image_url_160px,
+        },
+        "album": None if row.album_id is None else {
+            "id": row.album_id,
+            "spotify_id": row.album_spotify_id,
+            "title": row.album_title,
+            "album_type": row.album_type,
+            "total_tracks": row.total_tracks,
+            "release_date": row.release_date,
+            "image_url_640px": row.album_image_url_640px,
+            "image_url_300px": row.album_image_url_300px,
+            "image_url_64px": row.album_image_url_64px,
+        },
+        "track": None if row.track_id is None else {
+            "id": row.track_id,
+            "spotify_id": row.track_spotify_id,
+            "title": row.track_title,
+            "disc_number": row.disc_number,
+            "track_order": row.track_order,
+            "duration_ms": row.duration_ms,
+            "explicit": row.explicit,
+        }
+    }
+
+
+def serialize_catalog_item_summary(row):
+    return {
+        "id": row.catalog_item_id,
+        "spotify_id": row.catalog_item_spotify_id,
+        "spotify_artist_id": row.spotify_artist_id,
+        "position": row.position,
+        "comment": row.comment,
+        "created_date": row.created_date,
+        "updated_date": row.updated_date,
+        "item_type": row.item_type,
+        "title": row.item_title,
+        "artist_name": row.item_artist_name,
+        "image_url": row.item_image_url,
+    }
+
+
+def serialize_catalog_header(catalog):
+    return {
+        "id": catalog.id,
+        "name": catalog.name,
+        "comment": catalog.comment,
+        "isPrivate": catalog.is_private,
+        "created_date": catalog.created_date.isoformat(),
+        "updated_date": catalog.updated_date.isoformat(),
+    }
+
+
+def build_catalog_document(catalog):
+    return current_app.json.dumps({
+        **serialize_catalog_header(catalog),
+        "items": [serialize_catalog_item_row(row) for row in catalog_items_query(catalog.id)],
+    })
+
+
+def catalog_etag(catalog):
+    # updated_date moves on every header or item change, so it versions the whole document
+    return f"{catalog.id}-{catalog.updated_date.isoformat()}"
+
+
+def record_catalog_item_tombstones(*criteria):
+    record_tombstones("catalog_item", CatalogItem.id, CatalogItem.catalog_id, CatalogItem.spotify_id, *criteria)
+
+
+def catalog_changes(catalog, since=None):
+    # items added or changed since the client's sync token, plus the ids of removed ones.
+    # without a usable token every item is returned and the client replaces its copy.
+    now = datetime.now(timezone.utc)
+    full = needs_full_sync(since)
+
+    query = catalog_items_query(catalog.id)
+    if not full:
+        query = query.filter(CatalogItem.updated_date >= changed_after(since))
+
+    return {
+        "catalog": serialize_catalog_header(catalog),
+        "full": full,
+        "items": [serialize_catalog_item_row(row) for row in query],
+        "removed": [] if full else [item_id for item_id, _ in removed_since("catalog_item", catalog.id, since)],
+        "syncToken": sync_token(now),
+    }
+
+
+def touch_catalog(catalog_id):
+    # does not commit; bumps the version of the cached catalog document
+    db.session.query(Catalog).filter(
+        Catalog.id == catalog_id
+    ).update(
+        {Catalog.updated_date: datetime.now(timezone.utc)},
+        synchronize_session=False,
+    )
+
+
+CATALOG_BATCH_MAX_OPERATIONS = 1000
+
+
+def is_integer(value, allow_none=False):
+    # json true/false decode to bools, which are ints to isinstance
+    if value is None:
+        return allow_none
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def apply_catalog_item_operations(catalog, operations):
+    # applies removes, then moves, then adds, all in the caller's transaction.
+    # raises ValueError before the catalog is changed if an operation is invalid,
+    # though validating an add may already have ingested (and committed) the item
+    # from spotify.
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > CATALOG_BATCH_MAX_OPERATIONS:
+        raise ValueError(f"at most {CATALOG_BATCH_MAX_OPERATIONS} operations are allowed per request")
+
+    adds, moves, removes = [], [], []
+    for index, operation in enumerate(operations):
+        op = operation.get("op") if isinstance(operation, dict) else None
+        if op in ("add", "move") and not is_integer(operation.get("position"), allow_none=True):
+            raise ValueError(f"operation {index}: position must be an integer or null")
+
+        if op == "add":
+            if not operation.get("spotifyId") or not operation.get("spotifyArtistId"):
+                raise ValueError(f"operation {index}: add requires spotifyId and spotifyArtistId")
+            adds.append(operation)
+        elif op in ("move", "remove"):
+            if not is_integer(operation.get("itemId")):
+                raise ValueError(f"operation {index}: {op} requires an integer itemId")
+            (moves if op == "move" else removes).append(operation)
+        else:
+            raise ValueError(f"operation {index}: op must be one of add, move or remove")
+
+    referenced_ids = {operation["itemId"] for operation in moves + removes}
+    if referenced_ids:
+        owned_ids = {
+            item_id for item_id, in db.session.query(CatalogItem.id).filter(
+                CatalogItem.catalog_id == catalog.id,
+                CatalogItem.id.in_(referenced_ids),
+            )
+        }
+        missing_ids = referenced_ids - owned_ids
+        if missing_ids:
+            raise ValueError(f"items not found in this catalog: {sorted(missing_ids)}")
+
+    requested_items = {(operation["spotifyId"], operation["spotifyArtistId"]) for operation in adds}
+    invalid_items = requested_items - validate_items_in_database(requested_items)
+    if invalid_items:
+        raise ValueError(f"error validating items in database: {sorted(spotify_id for spotify_id, _ in invalid_items)}")
+
+    if removes:
+        removed_criteria = (
+            CatalogItem.catalog_id == catalog.id,
+            CatalogItem.id.in_([operation["itemId"] for operation in removes]),
+        )
+        record_catalog_item_tombstones(*removed_criteria)
+        db.session.execute(delete(CatalogItem).where(*removed_criteria))
+
+    removed_ids = {operation["itemId"] for operation in removes}
+    moves = [operation for operation in moves if operation["itemId"] not in removed_ids]
+
+    now = datetime.now(timezone.utc)
+    if moves:
+        db.session.execute(update(CatalogItem), [
+            {"id": operation["itemId"], "position": operation.get("position"), "updated_date": now}
+            for operation in moves
+        ])
+
+    added_ids = []
+    if adds:
+        next_position = next_catalog_position(catalog.id)
+        metadata = item_metadata(operation["spotifyId"] for operation in adds)
+        missing_metadata = dict.fromkeys(ITEM_METADATA_COLUMNS)
+        for operation in adds:
+            if operation.get("position") is None:
+                operation["position"] = next_position
+                next_position += CATALOG_POSITION_GAP
+
+        added_ids = db.session.execute(
+            insert(CatalogItem).values([
+                {
+                    "catalog_id": catalog.id,
+                    "spotify_id": operation["spotifyId"],
+                    "spotify_artist_id": operation["spotifyArtistId"],
+                    "position": operation.get("position"),
+                    "comment": operation.get("comment"),
+                    "created_date": now,
+                    "updated_date": now,
+                    **metadata.get(operation["spotifyId"], missing_metadata),
+                }
+                for operation in adds
+            ]).returning(CatalogItem.id)
+        ).scalars().all()
+
+    touch_catalog(catalog.id)
+
+    return {"added": added_ids, "moved": len(moves), "removed": len(removes)}
+
+
+# positions are spaced CATALOG_POSITION_GAP apart so a move can land between two
+# neighbours by updating only the moved row; the catalog is renumbered only when
+# a gap has been split down to nothing
+CATALOG_POSITION_GAP = 1024
+
+
+def next_catalog_position(catalog_id):
+    last_position = db.session.query(
+        func.max(CatalogItem.position)
+    ).filter(
+        CatalogItem.catalog_id == catalog_id
+    ).scalar()
+
+    return (last_position or 0) + CATALOG_POSITION_GAP
+
+
+def rebalance_catalog_positions(catalog_id):
+    ranked = select(
+        CatalogItem.id,
+        (func.row_number().over(order_by=CATALOG_ITEM_ORDER) * CATALOG_POSITION_GAP).label("new_position"),
+    ).where(
+        CatalogItem.catalog_id == catalog_id
+    ).subquery()
+
+    db.session.execute(
+        update(CatalogItem).where(
+            CatalogItem.id == ranked.c.id
+        ).values(
+            position=ranked.c.new_position,
+            updated_date=datetime.now(timezone.utc),
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def neighbour_position(item, anchor, after):
+    # position of the item adjacent to the anchor on the side the moved item is going
+    query = db.session.query(CatalogItem.position).filter(
+        CatalogItem.catalog_id == anchor.catalog_id,
+        CatalogItem.id != item.id,
+    )
+    if after:
+        query = query.filter(CatalogItem.position > anchor.position).order_by(asc(CatalogItem.position))
+    else:
+        query = query.filter(CatalogItem.position < anchor.position).order_by(CatalogItem.position.desc())
+
+    return query.limit(1).scalar()
+
+
+def position_between(item, anchor, after):
+    neighbour = neighbour_position(item, anchor, after)
+    if neighbour is None:
+        return anchor.position + (CATALOG_POSITION_GAP if after else -CATALOG_POSITION_GAP)
+
+    lower, upper = (anchor.position, neighbour) if after else (neighbour, anchor.position)
+    if upper - lower < 2:
+        return None
+    return (lower + upper) // 2
+
+
+def move_catalog_item(item, anchor, after):
+    # places item directly after (or before) anchor. does not commit.
+    # returns True when the catalog had to be renumbered to make room.
+    rebalanced = False
+    if anchor.position is None:
+        rebalance_catalog_positions(item.catalog_id)
+        db.session.refresh(anchor)
+        rebalanced = True
+
+    position = position_between(item, anchor, after)
+    if position is None:
+        rebalance_catalog_positions(item.catalog_id)
+        db.session.refresh(anchor)
+        rebalanced = True
+        position = position_between(item, anchor, after)
+
+    item.position = position
+    item.updated_date = datetime.now(timezone.utc)
+    touch_catalog(item.catalog_id)
+
+    return rebalanced
+
+
+CATALOG_COVER_IMAGE_COUNT = 4
+
+
+def catalog_listing(*criteria):
+    # catalogs with item counts and their first few cover images, in one statement:
+    # items are counted over the whole catalog, and covers come from the metadata
+    # snapshot of the first items that have an image
+    listed_ids = select(Catalog.id).where(*criteria)
+    item_counts = select(
+        CatalogItem.catalog_id,
+        func.count().label("item_count"),
+    ).where(
+        CatalogItem.catalog_id.in_(listed_ids)
+    ).group_by(
+        CatalogItem.catalog_id
+    ).subquery()
+    ranked_covers = select(
+        CatalogItem.catalog_id,
+        CatalogItem.item_image_url,
+        func.row_number().over(partition_by=CatalogItem.catalog_id, order_by=CATALOG_ITEM_ORDER).label("rank"),
+    ).where(
+        CatalogItem.catalog_id.in_(listed_ids),
+        CatalogItem.item_image_url.is_not(None),
+    ).subquery()
+
+    # legacy Query de-duplicates result rows that contain a full entity (Catalog here),
+    # so two covers with the same image would come back as one row without rank
+    rows = db.session.query(
+        Catalog,
+        ranked_covers.c.rank,
+        item_counts.c.item_count,
+        ranked_covers.c.item_image_url,
+    ).outerjoin(
+        item_counts, item_counts.c.catalog_id == Catalog.id
+    ).outerjoin(
+        ranked_covers, and_(
+            ranked_covers.c.catalog_id == Catalog.id,
+            ranked_covers.c.rank <= CATALOG_COVER_IMAGE_COUNT,
+        )
+    ).filter(
+        *criteria
+    ).order_by(
+        Catalog.id,
+        ranked_covers.c.rank,
+    ).all()
+
+    listing = {}
+    for catalog, _, item_count, cover_image_url in rows:
+        entry = listing.get(catalog.id)
+        if entry is None:
+            entry = listing[catalog.id] = {
+                "id": catalog.id,
+                "name": catalog.name,
+                "comment": catalog.comment,
+                "isPrivate": catalog.is_private,
+                "imageUrl": catalog.image_url,
+                "created_date": catalog.created_date.isoformat(),
+                "updated_date": catalog.updated_date.isoformat(),
+                "itemCount": item_count or 0,
+                "coverImages": [],
+            }
+        if cover_image_url:
+            entry["coverImages"].append(cover_image_url)
+
+    return list(listing.values())
+
+
+ARTIST_CATALOGS_PAGE_SIZE = 50
+ARTIST_CATALOGS_MAX_PAGE_SIZE = 200
+ARTIST_CATALOGS_ORDER = (
+    desc(func.coalesce(Catalog.upvotes, 0)),
+    desc(Catalog.created_date),
+    desc(CatalogItem.id),
+)
+
+
+def artist_catalogs_page(spotify_artist_id, cursor=None, limit=ARTIST_CATALOGS_PAGE_SIZE):
+    # public catalog entries featuring an artist, found through
+    # ix_catalog_items_spotify_artist_id and grouped by the item they feature
+    limit = min(max(limit, 1), ARTIST_CATALOGS_MAX_PAGE_SIZE)
+
+    query = db.session.query(
+        CatalogItem.id.label("catalog_item_id"),
+        CatalogItem.spotify_id.label("catalog_item_spotify_id"),
+        Catalog.id.label("catalog_id"),
+        Catalog.user_id,
+        Catalog.upvotes,
+        Catalog.downvotes,
+        Catalog.created_date,
+        Catalog.updated_date,
+        Catalog.comment,
+        Catalog.image_url,
+        Catalog.name,
+    ).join(
+        Catalog, CatalogItem.catalog_id == Catalog.id
+    ).filter(
+        CatalogItem.spotify_artist_id == spotify_artist_id,
+        Catalog.is_private.is_(False),
+    )
+    if cursor is not None:
+        query = query.filter(after_artist_catalogs_cursor(*decode_artist_catalogs_cursor(cursor)))
+
+    rows = query.order_by(*ARTIST_CATALOGS_ORDER).limit(limit + 1).all()
+
+    catalogs = {}
+    for catalog in rows[:limit]:
+        catalogs.setdefault(catalog.catalog_item_spotify_id, []).append({
+            "catalogItemId": catalog.catalog_item_id,
+            "catalogItemSpotifyId": catalog.catalog_item_spotify_id,
+            "catalogId": catalog.catalog_id,
+            "userId": catalog.user_id,
+            "upvotes": catalog.upvotes,
+            "downvotes": catalog.downvotes,
+            "createdDate": catalog.created_date,
+            "updatedDate": catalog.updated_date,
+            "comment": catalog.comment,
+            "imageUrl": catalog.image_url,
+            "name": catalog.name,
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last.upvotes or 0, last.created_date.isoformat(), last.catalog_item_id])
+
+    return {"catalogs": catalogs, "nextCursor": next_cursor}
+
+
+def decode_artist_catalogs_cursor(cursor):
+    upvotes, created_date, catalog_item_id = decode_cursor(cursor, 3)
+    try:
+        return int(upvotes), datetime.fromisoformat(created_date), int(catalog_item_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_artist_catalogs_cursor(upvotes, created_date, catalog_item_id):
+    catalog_upvotes = func.coalesce(Catalog.upvotes, 0)
+    return or_(
+        catalog_upvotes < upvotes,
+        and_(catalog_upvotes == upvotes, Catalog.created_date < created_date),
+        and_(catalog_upvotes == upvotes, Catalog.created_date == created_date, CatalogItem.id < catalog_item_id),
+    )
+
+
+def fork_catalog(source, user_id, name=None, comment=None, is_private=False):
+    # copies the catalog row and all its items in one INSERT ... SELECT; the items were
+    # validated when first added, so nothing goes back out to spotify. does not commit.
+    catalog = Catalog(
+        user_id=user_id,
+        name=name or source.name,
+        comment=comment if comment is not None else source.comment,
+        is_private=is_private,
+        image_url=source.image_url,
+    )
+    db.session.add(catalog)
+    db.session.flush()
+
+    now = datetime.now(timezone.utc)
+    db.session.execute(insert(CatalogItem).from_select(
+        ["catalog_id", "spotify_id", "spotify_artist_id", "position", "comment", "created_date", "updated_date",
+         *ITEM_METADATA_COLUMNS],
+        select(
+            literal(catalog.id),
+            CatalogItem.spotify_id,
+            CatalogItem.spotify_artist_id,
+            CatalogItem.position,
+            CatalogItem.comment,
+            literal(now),
+            literal(now),
+            *(getattr(CatalogItem, column) for column in ITEM_METADATA_COLUMNS),
+        ).where(
+            CatalogItem.catalog_id == source.id
+        ),
+    ))
+
+    return catalog
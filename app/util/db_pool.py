@@ -0,0 +1,71 @@
+from app import db
+from app.util.metrics import Counter, Gauge, Histogram
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+import time
+
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "motif_db_pool_checkout_wait_seconds",
+    "Time spent checking a connection out of the pool.",
+    ("pool",),
+    buckets=(.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "motif_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout.",
+    ("pool",),
+)
+
+
+def engine_options(config, url=None, name="default"):
+    # queue pool settings from config.Config; in-memory sqlite keeps the static pool
+    # flask-sqlalchemy gives it, which takes none of these
+    url = make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": config['DB_POOL_SIZE'],
+        "max_overflow": config['DB_MAX_OVERFLOW'],
+        "pool_timeout": config['DB_POOL_TIMEOUT'],
+        "pool_recycle": config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": config['DB_POOL_PRE_PING'],
+    }
+
+
+class InstrumentedQueuePool(QueuePool):
+    # times each checkout end to end: waiting for a free connection, opening a new
+    # one when the pool grows, and the pre-ping
+    def connect(self):
+        pool = getattr(self, "logging_name", None) or "default"
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=pool)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, pool=pool)
+
+
+def _queue_pools():
+    for bind_key, engine in db.engines.items():
+        if isinstance(engine.pool, QueuePool):
+            yield bind_key or "default", engine.pool
+
+
+def _pool_gauge(name, documentation, read):
+    return Gauge(name, documentation, ("pool",), collect=lambda: {
+        (pool_name,): read(pool) for pool_name, pool in _queue_pools()
+    })
+
+
+POOL_SIZE = _pool_gauge("motif_db_pool_size", "Configured pool_size.", lambda pool: pool.size())
+POOL_CHECKED_OUT = _pool_gauge("motif_db_pool_checked_out", "Connections currently in use.", lambda pool: pool.checkedout())
+POOL_CHECKED_IN = _pool_gauge("motif_db_pool_checked_in", "Idle connections held by the pool.", lambda pool: pool.checkedin())
+# negative while the pool hasn't opened pool_size connections yet
+POOL_OVERFLOW = _pool_gauge("motif_db_pool_overflow", "Connections open beyond pool_size.", lambda pool: pool.overflow())
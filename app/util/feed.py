@@ -0,0 +1,165 @@
+from flask import current_app
+from app import db
+from app.models import Activity, Catalog, FeedItem, Follow, Review, User
+from sqlalchemy import and_, delete, insert, literal, select, union_all
+from sqlalchemy.sql import desc
+
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+FOLLOW_BACKFILL_SIZE = 50
+
+
+def record_activity(actor_id, activity_type, review_id=None, catalog_id=None, spotify_id=None):
+    # does not commit; call inside the transaction that made the change
+    follower_count = db.session.query(User.follower_count).filter(User.id == actor_id).scalar() or 0
+    fanned_out = follower_count <= current_app.config['FEED_FANOUT_MAX_FOLLOWERS']
+
+    activity = Activity(
+        actor_id=actor_id,
+        activity_type=activity_type,
+        review_id=review_id,
+        catalog_id=catalog_id,
+        spotify_id=spotify_id,
+        fanned_out=fanned_out,
+    )
+    db.session.add(activity)
+    db.session.flush()
+
+    # authors past the threshold are merged in at read time instead
+    if fanned_out and follower_count:
+        db.session.execute(insert(FeedItem).from_select(
+            ["user_id", "activity_id"],
+            select(Follow.follower_id, literal(activity.id)).where(Follow.followee_id == actor_id),
+        ))
+
+    return activity
+
+
+def remove_activities(review_id=None, catalog_id=None):
+    if review_id is not None:
+        activity_ids = select(Activity.id).where(Activity.review_id == review_id)
+    else:
+        activity_ids = select(Activity.id).where(Activity.catalog_id == catalog_id)
+
+    db.session.execute(delete(FeedItem).where(FeedItem.activity_id.in_(activity_ids)))
+    db.session.execute(delete(Activity).where(Activity.id.in_(activity_ids)))
+
+
+def backfill_feed(user_id, followee_id):
+    recent_activity_ids = select(
+        literal(user_id), Activity.id
+    ).where(
+        Activity.actor_id == followee_id,
+        Activity.fanned_out.is_(True),
+    ).order_by(
+        desc(Activity.id)
+    ).limit(FOLLOW_BACKFILL_SIZE)
+
+    db.session.execute(insert(FeedItem).from_select(["user_id", "activity_id"], recent_activity_ids))
+
+
+def clear_followee_from_feed(user_id, followee_id):
+    db.session.execute(delete(FeedItem).where(
+        FeedItem.user_id == user_id,
+        FeedItem.activity_id.in_(select(Activity.id).where(Activity.actor_id == followee_id)),
+    ))
+
+
+def get_feed_page(user_id, cursor=None, limit=FEED_PAGE_SIZE):
+    limit = min(max(limit, 1), FEED_MAX_PAGE_SIZE)
+
+    # pushed: rows fanned out to this user on write (one range scan on the primary key)
+    pushed = select(
+        FeedItem.activity_id.label("activity_id")
+    ).where(
+        FeedItem.user_id == user_id
+    )
+    # pulled: activity from followed authors too popular to fan out
+    pulled = select(
+        Activity.id.label("activity_id")
+    ).join(
+        Follow, Follow.followee_id == Activity.actor_id
+    ).where(
+        Follow.follower_id == user_id,
+        Activity.fanned_out.is_(False),
+    )
+    if cursor is not None:
+        pushed = pushed.where(FeedItem.activity_id < cursor)
+        pulled = pulled.where(Activity.id < cursor)
+
+    pushed = pushed.order_by(desc(FeedItem.activity_id)).limit(limit).subquery()
+    pulled = pulled.order_by(desc(Activity.id)).limit(limit).subquery()
+    candidates = union_all(select(pushed.c.activity_id), select(pulled.c.activity_id)).subquery()
+
+    activity_ids = db.session.execute(
+        select(candidates.c.activity_id).order_by(desc(candidates.c.activity_id)).limit(limit)
+    ).scalars().all()
+    if not activity_ids:
+        return {"items": [], "nextCursor": None}
+
+    rows = db.session.query(
+        Activity.id,
+        Activity.activity_type,
+        Activity.spotify_id,
+        Activity.created_date,
+        User.id.label("user_id"),
+        User.username,
+        User.display_name,
+        User.profile_pic_url,
+        Review.id.label("review_id"),
+        Review.spotify_id.label("review_spotify_id"),
+        Review.spotify_artist_id,
+        Review.rating,
+        Review.comment.label("review_comment"),
+        Catalog.id.label("catalog_id"),
+        Catalog.name.label("catalog_name"),
+        Catalog.image_url.label("catalog_image_url"),
+    ).join(
+        User, Activity.actor_id == User.id
+    ).outerjoin(
+        Review, and_(Activity.review_id == Review.id, Review.is_private.is_(False))
+    ).outerjoin(
+        Catalog, and_(Activity.catalog_id == Catalog.id, Catalog.is_private.is_(False))
+    ).filter(
+        Activity.id.in_(activity_ids)
+    ).order_by(
+        desc(Activity.id)
+    ).all()
+
+    return {
+        "items": [serialize_feed_row(row) for row in rows if is_visible(row)],
+        "nextCursor": activity_ids[-1] if len(activity_ids) == limit else None,
+    }
+
+
+def is_visible(row):
+    # the joins drop subjects that were deleted or made private after the activity was recorded
+    return row.review_id is not None or row.catalog_id is not None
+
+
+def serialize_feed_row(row):
+    return {
+        "id": row.id,
+        "type": row.activity_type,
+        "spotifyId": row.spotify_id,
+        "createdDate": row.created_date.isoformat(),
+        "user": {
+            "userId": row.user_id,
+            "username": row.username,
+            "displayName": row.display_name,
+            "profilePicUrl": row.profile_pic_url,
+        },
+        "review": None if row.review_id is None else {
+            "id": row.review_id,
+            "spotifyId": row.review_spotify_id,
+            "spotifyArtistId": row.spotify_artist_id,
+            "rating": row.rating,
+            "comment": row.review_comment,
+        },
+        "catalog": None if row.catalog_id is None else {
+            "id": row.catalog_id,
+            "name": row.catalog_name,
+            "imageUrl": row.catalog_image_url,
+        },
+    }
@@ -0,0 +1,89 @@
+from flask import current_app, g
+from flask_jwt_extended import get_jwt_identity
+from app import db
+from app.models import User
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from threading import Lock
+import time
+
+
+# the authenticated user is loaded at most once per request (kept on g), and when
+# USER_CACHE_TTL_SECONDS is set, hot users are also served from a small process-wide
+# cache of detached snapshots. snapshots are merged into the request's session
+# without a query, so callers get a normal attached User they can modify.
+# writes to a user through the orm drop their snapshot; other workers' copies
+# expire with the ttl.
+_users = OrderedDict()
+_users_lock = Lock()
+_uncached = object()
+
+
+def _snapshot(user):
+    state = inspect(User)
+    snapshot = User(**{column.key: getattr(user, column.key) for column in state.column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def load_user(user_id):
+    ttl = current_app.config['USER_CACHE_TTL_SECONDS']
+    if ttl <= 0:
+        return db.session.get(User, user_id)
+
+    with _users_lock:
+        entry = _users.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            _users.move_to_end(user_id)
+            snapshot = entry[1]
+        else:
+            snapshot = None
+
+    if snapshot is not None:
+        return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and not db.session.is_modified(user):
+        with _users_lock:
+            _users[user_id] = (time.monotonic() + ttl, _snapshot(user))
+            while len(_users) > current_app.config['USER_CACHE_MAX_ENTRIES']:
+                _users.popitem(last=False)
+
+    return user
+
+
+def current_user():
+    user = g.get("_current_user", _uncached)
+    if user is _uncached:
+        identity = get_jwt_identity()
+        user = g._current_user = load_user(int(identity)) if identity is not None else None
+
+    return user
+
+
+def invalidate_user(*user_ids):
+    with _users_lock:
+        for user_id in user_ids:
+            _users.pop(user_id, None)
+
+
+def clear_user_cache():
+    with _users_lock:
+        _users.clear()
+
+
+# drop snapshots when a user row is flushed, and again once the change commits so a
+# snapshot taken from the old row in between doesn't outlive the write
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_write(mapper, connection, target):
+    invalidate_user(target.id)
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault("invalidated_users", set()).add(target.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_on_commit(session):
+    invalidate_user(*session.info.pop("invalidated_users", ()))
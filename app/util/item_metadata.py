@@ -0,0 +1,124 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models import Album, Artist, ArtistAlbumTrack, Catalog, CatalogItem, Review, Track
+from app.util.review_listing import bump_review_listing_versions
+from datetime import datetime, timezone
+from sqlalchemy import case, func, or_, select, update
+import click
+import time
+
+
+# display metadata copied onto catalog items and reviews when they're written, so
+# listings can render them without joining through artist_album_track. the copies
+# are kept current by refresh_item_metadata, run from `flask refresh-item-metadata`.
+ITEM_METADATA_COLUMNS = ("item_type", "item_title", "item_artist_name", "item_image_url")
+
+
+def item_metadata_select():
+    return select(
+        ArtistAlbumTrack.spotify_id,
+        case(
+            (ArtistAlbumTrack.track_id.isnot(None), "track"),
+            (ArtistAlbumTrack.album_id.isnot(None), "album"),
+            else_="artist",
+        ).label("item_type"),
+        func.coalesce(Track.title, Album.title, Artist.title).label("item_title"),
+        Artist.title.label("item_artist_name"),
+        func.coalesce(
+            Album.image_url_300px,
+            Album.image_url_640px,
+            Artist.image_url_320px,
+            Artist.image_url_160px,
+            Artist.image_url_640px,
+        ).label("item_image_url"),
+    ).join(
+        Artist, ArtistAlbumTrack.artist_id == Artist.id
+    ).outerjoin(
+        Album, ArtistAlbumTrack.album_id == Album.id
+    ).outerjoin(
+        Track, ArtistAlbumTrack.track_id == Track.id
+    )
+
+
+def item_metadata(spotify_ids):
+    # {spotify_id: {column: value}} for the ingested items; unknown ids are left out
+    spotify_ids = {spotify_id for spotify_id in spotify_ids if spotify_id}
+    if not spotify_ids:
+        return {}
+
+    rows = db.session.execute(
+        item_metadata_select().where(ArtistAlbumTrack.spotify_id.in_(spotify_ids))
+    ).all()
+
+    return {row.spotify_id: {column: getattr(row, column) for column in ITEM_METADATA_COLUMNS} for row in rows}
+
+
+def item_metadata_for(spotify_id):
+    return item_metadata([spotify_id]).get(spotify_id, dict.fromkeys(ITEM_METADATA_COLUMNS))
+
+
+def refresh_item_metadata(model, spotify_ids=None):
+    # rewrites stale snapshots in one UPDATE ... FROM; rows already matching the source are
+    # skipped. review updated_date is shown as the edit time so it's left alone; catalog
+    # items move theirs so delta sync picks up the new snapshot.
+    # does not commit. returns the changed rows' (id, user or catalog id, spotify_artist_id).
+    source = item_metadata_select()
+    if spotify_ids is not None:
+        source = source.where(ArtistAlbumTrack.spotify_id.in_(spotify_ids))
+    source = source.subquery()
+
+    owner_id = Review.user_id if model is Review else CatalogItem.catalog_id
+
+    return db.session.execute(
+        update(model).where(
+            model.spotify_id == source.c.spotify_id,
+            or_(*(
+                getattr(model, column).is_distinct_from(source.c[column])
+                for column in ITEM_METADATA_COLUMNS
+            )),
+        ).values({
+            **{column: source.c[column] for column in ITEM_METADATA_COLUMNS},
+            "updated_date": model.updated_date if model is Review else datetime.now(timezone.utc),
+        }).returning(
+            model.id, owner_id, model.spotify_artist_id
+        ).execution_options(synchronize_session=False)
+    ).all()
+
+
+def refresh_all_item_metadata(spotify_ids=None):
+    # refreshes both tables and invalidates whatever was built from the old snapshot
+    reviews = refresh_item_metadata(Review, spotify_ids)
+    for user_id in {user_id for _, user_id, _ in reviews}:
+        bump_review_listing_versions(
+            user_id, *{artist_id for _, review_user_id, artist_id in reviews if review_user_id == user_id}
+        )
+
+    catalog_items = refresh_item_metadata(CatalogItem, spotify_ids)
+    catalog_ids = {catalog_id for _, catalog_id, _ in catalog_items}
+    if catalog_ids:
+        db.session.execute(
+            update(Catalog).where(
+                Catalog.id.in_(catalog_ids)
+            ).values(
+                updated_date=datetime.now(timezone.utc)
+            ).execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    return {"reviews": len(reviews), "catalog_items": len(catalog_items)}
+
+
+@click.command("refresh-item-metadata")
+@click.option("--interval", type=float, default=None,
+              help="Keep running, refreshing every INTERVAL seconds.")
+@with_appcontext
+def refresh_item_metadata_command(interval):
+    while True:
+        refreshed = refresh_all_item_metadata()
+        current_app.logger.info("refreshed item metadata: %s", refreshed)
+        click.echo(", ".join(f"{table}: {count}" for table, count in refreshed.items()))
+
+        if interval is None:
+            return
+        time.sleep(interval)
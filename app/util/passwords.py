@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+import threading
+
+
+# password hashing runs on a small dedicated pool instead of the request thread.
+# hashlib's scrypt and pbkdf2 release the gil, so the pool's size caps how many
+# cores (and, for scrypt, how much memory) a login burst can take from the rest
+# of the worker. requests past the pending limit are turned away rather than queued.
+class PasswordHasherBusy(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_method_prefixes = {}
+
+
+def _pool():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = current_app.config['PASSWORD_HASH_WORKERS']
+                _slots = threading.BoundedSemaphore(workers + current_app.config['PASSWORD_HASH_MAX_PENDING'])
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    return _executor, _slots
+
+
+def _run(fn, *args):
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy("Too many password checks in progress")
+
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError as e:
+        future.cancel()
+        raise PasswordHasherBusy("Timed out waiting for a password check") from e
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def method_prefix(method):
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so compare against
+    # the prefix of a real hash rather than the configured string
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = _method_prefixes[method] = generate_password_hash("", method).split("$", 1)[0]
+
+    return prefix
+
+
+def needs_rehash(password_hash):
+    return password_hash.split("$", 1)[0] != method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
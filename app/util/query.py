@@ -1,87 +1,128 @@
 from app import db
-from app.models import Catalog, Review, User
-from collections import defaultdict
-from sqlalchemy.sql import desc
+from app.models import Catalog, Review, Tombstone, User
+from app.util.catalogs import catalog_listing
+from app.util.review_listing import (
+    REVIEW_LISTING_PAGE_SIZE,
+    clamp_listing_page,
+    group_review_rows,
+    user_public_reviews_query,
+)
+from app.util.sync import changed_after, needs_full_sync, record_tombstones, removed_since, sync_token
+from datetime import datetime, timezone
+from sqlalchemy import func
 
 
-def get_public_user(user_id):
-    user = User.query.filter_by(id=user_id).first()
-    reviews = get_public_user_reviews(user_id)
-    catalogs = []
+def get_public_user(user_id, reviews_page_size=REVIEW_LISTING_PAGE_SIZE):
+    # the whole public profile in three statements: the user, their public catalogs
+    # with counts and covers, and the first page of their public reviews.
+    # later review pages come from
+    # /api/reviews/user/<id>?page=<nextReviewsPage>&pageSize=<reviewsPageSize>,
+    # passing pageSize along so page 2 starts where this page ended.
+    user = db.session.query(
+        User.id,
+        User.username,
+        User.display_name,
+        User.profile_pic_url,
+        User.follower_count,
+    ).filter(
+        User.id == user_id
+    ).first()
+    if not user:
+        return None
+
+    _, reviews_page_size = clamp_listing_page(1, reviews_page_size)
+    review_rows = user_public_reviews_query(user_id).limit(reviews_page_size + 1).all()
 
     return {
         "userId": user.id,
         "username": user.username,
         "displayName": user.display_name,
         "profilePicUrl": user.profile_pic_url,
-        "catalogs": catalogs,
-        "reviews": reviews,
+        "followerCount": user.follower_count,
+        "catalogs": get_public_user_catalogs(user_id),
+        "reviews": group_review_rows(review_rows[:reviews_page_size]),
+        "nextReviewsPage": 2 if len(review_rows) > reviews_page_size else None,
+        "reviewsPageSize": reviews_page_size,
     }
 
 
 def get_public_user_catalogs(user_id):
-    print('todo')
+    return catalog_listing(Catalog.user_id == user_id, Catalog.is_private.is_(False))
 
 
 def get_public_user_reviews(user_id):
-    sorted_reviews_query = (
-        db.session.query(
-            Review.id.label("review_id"),
-            Review.spotify_id,
-            Review.user_id,
-            Review.comment,
-            Review.rating,
-            Review.created_date,
-            Review.updated_date,
-            Review.upvotes,
-            Review.is_private,
-            User.username,
-            User.display_name,
-        ).join(
-            User, Review.user_id == User.id
-        ).filter(
-            Review.user_id == user_id,
-            Review.is_private is False,
-        ).order_by(
-            desc(Review.created_date),
-        )
-    )
-
-    reviews = defaultdict(list)
-    for review in sorted_reviews_query:
-        reviews[review.spotify_id].append({
-            "spotifyId": review.spotify_id,
-            "reviewId": review.review_id,
-            "userId": review.user_id,
-            "comment": review.comment,
-            "rating": review.rating,
-            "createdDate": review.created_date,
-            "updatedDate": review.updated_date,
-            "upvotes": review.upvotes,
-            "username": review.username,
-            "displayName": review.display_name,
-        })
-
-    reviews_dict = dict(reviews)
-    return reviews_dict
+    return group_review_rows(user_public_reviews_query(user_id))
 
 
 def get_current_user_reviews(user_id):
     reviews = Review.query.filter_by(user_id=user_id).all()
 
-    return [
-        {
-            "comment": review.comment,
-            "createdDate": review.created_date.isoformat(),
-            "downvotes": review.downvotes,
-            "id": review.id,
-            "isPrivate": review.is_private,
-            "rating": review.rating,
-            "spotifyArtistId": review.spotify_artist_id,
-            "spotifyId": review.spotify_id,
-            "updatedDate": review.updated_date.isoformat(),
-            "upvotes": review.upvotes,
-            "userId": review.user_id,
-        }
-        for review in reviews
-    ]
+    return [serialize_review(review) for review in reviews]
+
+
+def get_current_user_summary(user):
+    # what login and verify return instead of every review. reviewSyncToken marks the
+    # user's latest review write or delete: a client holding a sync token at or past it
+    # is current, otherwise it calls review sync with the token it has.
+    review_count, last_updated = db.session.query(
+        func.count(Review.id), func.max(Review.updated_date)
+    ).filter(
+        Review.user_id == user.id
+    ).one()
+    last_deleted = db.session.query(
+        func.max(Tombstone.deleted_date)
+    ).filter(
+        Tombstone.entity == "review",
+        Tombstone.parent_id == user.id,
+    ).scalar()
+    last_changed = max(filter(None, (last_updated, last_deleted)), default=None)
+
+    return {
+        "userId": user.id,
+        "username": user.username,
+        "displayName": user.display_name,
+        "profilePicUrl": user.profile_pic_url,
+        "reviewCount": review_count,
+        "reviewSyncToken": sync_token(last_changed) if last_changed else None,
+    }
+
+
+def get_current_user_review_changes(user_id, since=None):
+    # reviews written or edited since the token plus tombstones for deleted ones;
+    # without a usable token every review is returned and the client replaces its copy
+    now = datetime.now(timezone.utc)
+    full = needs_full_sync(since)
+
+    query = Review.query.filter(Review.user_id == user_id)
+    if not full:
+        query = query.filter(Review.updated_date >= changed_after(since))
+
+    return {
+        "full": full,
+        "reviews": [serialize_review(review) for review in query.order_by(Review.updated_date, Review.id)],
+        "removed": [] if full else [
+            {"id": review_id, "spotifyId": spotify_id}
+            for review_id, spotify_id in removed_since("review", user_id, since)
+        ],
+        "syncToken": sync_token(now),
+    }
+
+
+def record_review_tombstones(*criteria):
+    record_tombstones("review", Review.id, Review.user_id, Review.spotify_id, *criteria)
+
+
+def serialize_review(review):
+    return {
+        "comment": review.comment,
+        "createdDate": review.created_date.isoformat(),
+        "downvotes": review.downvotes,
+        "id": review.id,
+        "isPrivate": review.is_private,
+        "rating": review.rating,
+        "spotifyArtistId": review.spotify_artist_id,
+        "spotifyId": review.spotify_id,
+        "updatedDate": review.updated_date.isoformat(),
+        "upvotes": review.upvotes,
+        "userId": review.user_id,
+    }
@@ -0,0 +1,154 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from functools import wraps
+from sqlalchemy import Select, event, text
+from threading import Lock
+import logging
+import random
+import time
+
+
+# read-only endpoints (marked with @read_replica) send their selects to a replica from
+# READ_REPLICA_URLS; everything else, every flush and every insert/update/delete stays
+# on the primary. a user who just committed a write carries a cookie that keeps their
+# reads on the primary for REPLICA_STICKY_SECONDS, so they see their own changes.
+# replicas that are unreachable or further behind than REPLICA_MAX_LAG_SECONDS are
+# skipped until the next check.
+REPLICA_BIND_PREFIX = "replica_"
+STICKY_COOKIE = "read_primary_until"
+
+logger = logging.getLogger(__name__)
+
+_health = {}
+_health_lock = Lock()
+
+# postgres standbys; an idle primary stops advancing the replay timestamp, so a
+# standby that has replayed everything it received counts as current
+_LAG_QUERIES = {
+    "postgresql": text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+def replica_binds(config, engine_options):
+    # SQLALCHEMY_BINDS entries for each replica url, sharing the primary's pool settings
+    urls = [url.strip() for url in (config['READ_REPLICA_URLS'] or '').split(',') if url.strip()]
+
+    return {
+        f"{REPLICA_BIND_PREFIX}{index}": {"url": url, **engine_options(config, url, f"{REPLICA_BIND_PREFIX}{index}")}
+        for index, url in enumerate(urls)
+    }
+
+
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g._read_replica = not primary_pinned()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def primary_pinned():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_lag(engine):
+    # connecting at all is the reachability check; lag is only measured where we know how
+    with engine.connect() as connection:
+        query = _LAG_QUERIES.get(engine.dialect.name)
+        if query is None:
+            return 0
+
+        return float(connection.execute(query).scalar() or 0)
+
+
+def replica_is_healthy(name, engine):
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(name)
+        if checked and checked[0] > now:
+            return checked[1]
+
+    try:
+        lag = replica_lag(engine)
+        healthy = lag <= current_app.config['REPLICA_MAX_LAG_SECONDS']
+        if not healthy:
+            logger.warning("replica %s is %.1fs behind, reading from primary", name, lag)
+    except Exception:
+        logger.exception("replica %s is unreachable, reading from primary", name)
+        healthy = False
+
+    with _health_lock:
+        _health[name] = (now + current_app.config['REPLICA_CHECK_INTERVAL'], healthy)
+
+    return healthy
+
+
+def choose_replica(engines):
+    replicas = [(name, engine) for name, engine in engines.items() if name and name.startswith(REPLICA_BIND_PREFIX)]
+    random.shuffle(replicas)
+    for name, engine in replicas:
+        if replica_is_healthy(name, engine):
+            return engine
+
+    return None
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and has_request_context()
+            and g.get("_read_replica")
+        ):
+            replica = choose_replica(self._db.engines)
+            if replica is not None:
+                return replica
+
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _note_write_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_to_primary(session):
+    # after a committed write, later reads in this request and the user's next
+    # few requests go to the primary
+    if session.info.pop("wrote", False) and has_request_context():
+        g._read_replica = False
+        g._wrote_to_primary = True
+
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def _forget_writes(session, previous_transaction):
+    session.info.pop("wrote", None)
+
+
+def set_sticky_cookie(response):
+    if g.get("_wrote_to_primary") and current_app.config['READ_REPLICA_URLS']:
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(time.time() + current_app.config['REPLICA_STICKY_SECONDS']),
+            max_age=current_app.config['REPLICA_STICKY_SECONDS'],
+            httponly=True,
+            secure=True,
+            samesite='None',
+        )
+    return response
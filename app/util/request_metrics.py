@@ -0,0 +1,89 @@
+from flask import g, has_request_context, request
+from app.util.metrics import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import time
+
+
+# per-route request metrics for /internal/metrics. routes are labelled by their url
+# rule rather than the path, so label cardinality stays bounded by the route table.
+# time spent waiting on the database and on spotify is accumulated on g by
+# add_request_time and reported per request alongside the total.
+REQUEST_LATENCY = Histogram(
+    "motif_http_request_duration_seconds",
+    "Time from the first before_request hook to teardown.",
+    ("blueprint", "route", "method"),
+)
+REQUESTS = Counter(
+    "motif_http_requests_total",
+    "Finished requests by response status.",
+    ("blueprint", "route", "method", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "motif_http_requests_in_flight",
+    "Requests currently being handled by this process.",
+)
+REQUEST_DEPENDENCY_TIME = Histogram(
+    "motif_http_request_dependency_seconds",
+    "Time a request spent waiting on the database or spotify.",
+    ("blueprint", "route", "dependency"),
+)
+
+DEPENDENCIES = ("db", "spotify")
+
+
+def add_request_time(dependency, seconds):
+    if has_request_context():
+        times = g.setdefault("_dependency_seconds", dict.fromkeys(DEPENDENCIES, 0.0))
+        times[dependency] += seconds
+
+
+def _start_request():
+    g._request_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _note_status(response):
+    g._response_status = response.status_code
+    return response
+
+
+def _finish_request(exception):
+    started = g.pop("_request_started", None)
+    if started is None:
+        return
+
+    REQUESTS_IN_FLIGHT.dec()
+    blueprint = request.blueprint or ""
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    status = g.get("_response_status", 500)
+
+    REQUEST_LATENCY.observe(time.perf_counter() - started, blueprint=blueprint, route=route, method=request.method)
+    REQUESTS.inc(blueprint=blueprint, route=route, method=request.method, status=status)
+    for dependency, seconds in g.get("_dependency_seconds", dict.fromkeys(DEPENDENCIES, 0.0)).items():
+        REQUEST_DEPENDENCY_TIME.observe(seconds, blueprint=blueprint, route=route, dependency=dependency)
+
+
+def init_request_metrics(app):
+    # registered ahead of the other hooks so the timing covers them too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_note_status)
+    app.teardown_request(_finish_request)
+
+
+# cursor time on every engine, replicas included
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    add_request_time("db", time.perf_counter() - conn.info["_query_started"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(context):
+    started = context.connection.info.get("_query_started") if context.connection is not None else None
+    if started:
+        add_request_time("db", time.perf_counter() - started.pop())
@@ -0,0 +1,140 @@
+from app import db
+from app.models import Review, User
+from app.util.cache import bump_cache_versions
+from app.util.json_provider import http_date
+from datetime import date
+from sqlalchemy.sql import desc
+import json
+
+
+# (response key, column) pairs in select order. rows come back as tuples in this
+# order, so serialization zips values against precompiled encoders instead of
+# looking up attributes by name on every row.
+REVIEW_LISTING_FIELDS = (
+    ("spotifyId", Review.spotify_id),
+    ("reviewId", Review.id),
+    ("userId", Review.user_id),
+    ("comment", Review.comment),
+    ("rating", Review.rating),
+    ("createdDate", Review.created_date),
+    ("updatedDate", Review.updated_date),
+    ("upvotes", Review.upvotes),
+    ("username", User.username),
+    ("displayName", User.display_name),
+    ("itemType", Review.item_type),
+    ("title", Review.item_title),
+    ("artistName", Review.item_artist_name),
+    ("imageUrl", Review.item_image_url),
+)
+REVIEW_LISTING_KEYS = tuple(key for key, _ in REVIEW_LISTING_FIELDS)
+REVIEW_LISTING_COLUMNS = tuple(column for _, column in REVIEW_LISTING_FIELDS)
+REVIEW_LISTING_YIELD_PER = 1000
+REVIEW_LISTING_PAGE_SIZE = 50
+REVIEW_LISTING_MAX_PAGE_SIZE = 200
+
+_encode_string = json.JSONEncoder().encode
+
+
+def _encode_date(value):
+    # matches flask's default provider, which renders dates as http dates
+    return '"' + http_date(value) + '"'
+
+
+def _nullable(encode):
+    def encode_nullable(value):
+        return "null" if value is None else encode(value)
+    return encode_nullable
+
+
+def _column_encoder(column):
+    python_type = column.type.python_type
+    if python_type is int:
+        return _nullable(str)
+    if issubclass(python_type, date):
+        return _nullable(_encode_date)
+    return _nullable(_encode_string)
+
+
+_ROW_ENCODERS = tuple(_column_encoder(column) for column in REVIEW_LISTING_COLUMNS)
+_ROW_TEMPLATE = "{" + ",".join(f"{_encode_string(key)}:%s" for key in REVIEW_LISTING_KEYS) + "}"
+
+
+def public_reviews_query(*criteria, order_by=()):
+    return db.session.query(
+        *REVIEW_LISTING_COLUMNS
+    ).join(
+        User, Review.user_id == User.id
+    ).filter(
+        Review.is_private.is_(False),
+        *criteria
+    ).order_by(
+        *order_by
+    )
+
+
+def artist_public_reviews_query(artist_id):
+    return public_reviews_query(
+        Review.spotify_artist_id == artist_id,
+        order_by=(desc(Review.upvotes), desc(Review.created_date)),
+    )
+
+
+def user_public_reviews_query(user_id):
+    return public_reviews_query(
+        Review.user_id == user_id,
+        order_by=(desc(Review.created_date),),
+    )
+
+
+def bump_review_listing_versions(user_id, *spotify_artist_ids):
+    # call before committing any review write so cached listings for both sides are invalidated
+    bump_cache_versions(
+        ("user_reviews", user_id),
+        *(("artist_reviews", spotify_artist_id) for spotify_artist_id in spotify_artist_ids)
+    )
+
+
+def clamp_listing_page(page, page_size):
+    # page is 1-based; None returns the whole listing, which has no page size
+    if page is None:
+        return None, None
+    return max(page, 1), min(max(page_size, 1), REVIEW_LISTING_MAX_PAGE_SIZE)
+
+
+def paginate_listing(query, page, page_size=REVIEW_LISTING_PAGE_SIZE):
+    page, page_size = clamp_listing_page(page, page_size)
+    if page is None:
+        return query
+
+    return query.limit(page_size).offset((page - 1) * page_size)
+
+
+def group_review_rows(rows):
+    reviews = {}
+    for row in rows:
+        group = reviews.get(row[0])
+        if group is None:
+            group = reviews[row[0]] = []
+        group.append(dict(zip(REVIEW_LISTING_KEYS, row)))
+
+    return reviews
+
+
+def encode_review_row(row):
+    return _ROW_TEMPLATE % tuple([encode(value) for encode, value in zip(_ROW_ENCODERS, row)])
+
+
+def encode_grouped_reviews(query, yield_per=REVIEW_LISTING_YIELD_PER):
+    # builds the same {spotifyId: [review, ...]} document as jsonify(group_review_rows(...)),
+    # encoding each row straight to a json fragment as it streams off the cursor
+    groups = {}
+    for row in query.yield_per(yield_per):
+        group = groups.get(row[0])
+        if group is None:
+            group = groups[row[0]] = []
+        group.append(encode_review_row(row))
+
+    return "{" + ",".join(
+        f"{_encode_string(spotify_id)}:[{','.join(group)}]"
+        for spotify_id, group in groups.items()
+    ) + "}"
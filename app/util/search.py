@@ -0,0 +1,116 @@
+from app import db
+from app.models import Catalog, CatalogItem, Review, SEARCH_INDEXED_COLUMNS, User
+from app.util.review_listing import REVIEW_LISTING_COLUMNS, REVIEW_LISTING_KEYS
+from sqlalchemy import Float, Integer, func, select, text, union_all
+from sqlalchemy.sql import desc
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+
+def fts5_query(query_text):
+    # quote every term so user input can't use (or break on) fts5 query syntax
+    terms = query_text.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_matches(table_name, query_text):
+    # (id, rank) rows for one indexed table, higher rank is a better match
+    if table_name not in SEARCH_INDEXED_COLUMNS:
+        raise ValueError(f'{table_name} has no search index')
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = text(
+            f"SELECT id, ts_rank(search_vector, websearch_to_tsquery('english', :q)) AS rank "
+            f"FROM {table_name} WHERE search_vector @@ websearch_to_tsquery('english', :q)"
+        ).bindparams(q=query_text)
+    elif dialect == 'sqlite':
+        # bm25 is lower-is-better, so flip its sign
+        statement = text(
+            f"SELECT rowid AS id, -bm25({table_name}_fts) AS rank "
+            f"FROM {table_name}_fts WHERE {table_name}_fts MATCH :q"
+        ).bindparams(q=fts5_query(query_text))
+    else:
+        raise NotImplementedError(f'full-text search is not supported for the {dialect} dialect')
+
+    return statement.columns(id=Integer, rank=Float).subquery()
+
+
+def clamp_page(page, page_size):
+    return max(page, 1), min(max(page_size, 1), SEARCH_MAX_PAGE_SIZE)
+
+
+def search_reviews(query_text, page=1, page_size=SEARCH_PAGE_SIZE):
+    page, page_size = clamp_page(page, page_size)
+    matches = search_matches('reviews', query_text)
+
+    rows = db.session.query(
+        *REVIEW_LISTING_COLUMNS, matches.c.rank
+    ).join(
+        matches, matches.c.id == Review.id
+    ).join(
+        User, Review.user_id == User.id
+    ).filter(
+        Review.is_private.is_(False)
+    ).order_by(
+        desc(matches.c.rank),
+        desc(Review.id),
+    ).limit(page_size).offset((page - 1) * page_size).all()
+
+    return {
+        "page": page,
+        "pageSize": page_size,
+        "results": [
+            {**dict(zip(REVIEW_LISTING_KEYS, row)), "rank": row.rank}
+            for row in rows
+        ],
+    }
+
+
+def search_catalogs(query_text, page=1, page_size=SEARCH_PAGE_SIZE):
+    page, page_size = clamp_page(page, page_size)
+
+    # a catalog matches on its own name/comment or on any of its items' comments
+    catalog_matches = search_matches('catalogs', query_text)
+    item_matches = search_matches('catalog_items', query_text)
+    all_matches = union_all(
+        select(catalog_matches.c.id.label('catalog_id'), catalog_matches.c.rank),
+        select(CatalogItem.catalog_id, item_matches.c.rank).join(item_matches, item_matches.c.id == CatalogItem.id),
+    ).subquery()
+    best_matches = select(
+        all_matches.c.catalog_id,
+        func.max(all_matches.c.rank).label('rank'),
+    ).group_by(
+        all_matches.c.catalog_id
+    ).subquery()
+
+    rows = db.session.query(
+        Catalog, best_matches.c.rank
+    ).join(
+        best_matches, best_matches.c.catalog_id == Catalog.id
+    ).filter(
+        Catalog.is_private.is_(False)
+    ).order_by(
+        desc(best_matches.c.rank),
+        desc(Catalog.id),
+    ).limit(page_size).offset((page - 1) * page_size).all()
+
+    return {
+        "page": page,
+        "pageSize": page_size,
+        "results": [
+            {
+                "id": catalog.id,
+                "userId": catalog.user_id,
+                "name": catalog.name,
+                "comment": catalog.comment,
+                "imageUrl": catalog.image_url,
+                "created_date": catalog.created_date.isoformat(),
+                "updated_date": catalog.updated_date.isoformat(),
+                "rank": rank,
+            }
+            for catalog, rank in rows
+        ],
+    }
@@ -1,19 +1,42 @@
 from flask import current_app
-from app.models import User, Artist, Album, Track, ArtistAlbumTrack
+from app.models import Artist, Album, Track, ArtistAlbumTrack
 from app import db
+from app.util.identity import load_user
+from app.util.request_metrics import add_request_time
 from datetime import datetime, timedelta, timezone
+from http.cookiejar import DefaultCookiePolicy
 import base64
 import requests
+import time
 
 
-SPOTIFY_API_URL = 'https://api.spotify.com/v1'
+class SpotifySession(requests.Session):
+    # one session per process so calls reuse connections, timed into the request
+    # metrics. it's shared across users, so cookies are never stored.
+    def __init__(self):
+        super().__init__()
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=()))
+
+    def request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            add_request_time("spotify", time.perf_counter() - start)
+
+
+spotify_http = SpotifySession()
 
 
 def get_user_token(user):
-    if user.spotify_token_expires and datetime.now(timezone.utc) < user.spotify_token_expires:
+    expires = user.spotify_token_expires
+    if expires and expires.tzinfo is None:
+        # sqlite hands timestamps back without their zone
+        expires = expires.replace(tzinfo=timezone.utc)
+    if expires and datetime.now(timezone.utc) < expires:
         return user.spotify_access_token
 
-    token_url = 'https://accounts.spotify.com/api/token'
+    token_url = f"{current_app.config['SPOTIFY_ACCOUNTS_URL']}/api/token"
     client_id = current_app.config['SPOTIFY_CLIENT_ID']
     client_secret = current_app.config['SPOTIFY_CLIENT_SECRET']
 
@@ -36,7 +59,7 @@ def get_user_token(user):
         }
         headers = {}
 
-    response = requests.post(token_url, data=token_data, headers=headers)
+    response = spotify_http.post(token_url, data=token_data, headers=headers)
     token_info = response.json()
 
     if response.status_code != 200:
@@ -50,7 +73,8 @@ def get_user_token(user):
 
 
 def get_client_token():
-    user = User.query.get(-1)
+    # the client credentials user is read on every spotify call, so it comes from the user cache
+    user = load_user(-1)
     access_token = get_user_token(user)
     return access_token
 
@@ -61,8 +85,8 @@ def validate_item_in_database(spotify_id, spotify_artist_id):
 
         artist_row = Artist.query.filter_by(spotify_id=spotify_artist_id).first()
         if not artist_row:
-            response = requests.get(
-                f'https://api.spotify.com/v1/artists/{spotify_artist_id}',
+            response = spotify_http.get(
+                f"{current_app.config['SPOTIFY_API_URL']}/artists/{spotify_artist_id}",
                 headers={'Authorization': f'Bearer {access_token}'},
             )
             artist_json = response.json()
@@ -93,8 +117,8 @@ def validate_item_in_database(spotify_id, spotify_artist_id):
         if artist_album_track:
             return True
 
-        album_response = requests.get(
-            f'https://api.spotify.com/v1/albums/{spotify_id}',
+        album_response = spotify_http.get(
+            f"{current_app.config['SPOTIFY_API_URL']}/albums/{spotify_id}",
             headers={'Authorization': f'Bearer {access_token}'},
             params={'market': 'US'}
         )
@@ -102,8 +126,8 @@ def validate_item_in_database(spotify_id, spotify_artist_id):
             track_json = None
             album_json = album_response.json()
         else:
-            track_response = requests.get(
-                f'https://api.spotify.com/v1/tracks/{spotify_id}',
+            track_response = spotify_http.get(
+                f"{current_app.config['SPOTIFY_API_URL']}/tracks/{spotify_id}",
                 headers={'Authorization': f'Bearer {access_token}'},
                 params={'market': 'US'}
             )
@@ -167,3 +191,27 @@ def validate_item_in_database(spotify_id, spotify_artist_id):
 
     except Exception as e:
         return False
+
+
+def validate_items_in_database(items):
+    # items: iterable of (spotify_id, spotify_artist_id) pairs
+    # resolves everything already ingested in one query, only unknown items go out to spotify
+    pairs = {(spotify_id, spotify_artist_id) for spotify_id, spotify_artist_id in items if spotify_id and spotify_artist_id}
+    if not pairs:
+        return set()
+
+    known_rows = db.session.query(
+        ArtistAlbumTrack.spotify_id,
+        Artist.spotify_id.label("artist_spotify_id"),
+    ).join(
+        Artist, ArtistAlbumTrack.artist_id == Artist.id
+    ).filter(
+        ArtistAlbumTrack.spotify_id.in_({spotify_id for spotify_id, _ in pairs})
+    ).all()
+
+    valid = {(row.spotify_id, row.artist_spotify_id) for row in known_rows} & pairs
+    for spotify_id, spotify_artist_id in pairs - valid:
+        if validate_item_in_database(spotify_id, spotify_artist_id):
+            valid.add((spotify_id, spotify_artist_id))
+
+    return valid
@@ -0,0 +1,156 @@
+from flask import g, has_request_context, request
+from app.util.metrics import Counter, Histogram
+from collections import Counter as Tally
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+import os
+import random
+import sys
+import time
+
+
+# sql profiling, switched on with SQL_PROFILE:
+#   dev      every request is profiled and gets a Server-Timing header with its query
+#            count and time
+#   sampled  SQL_PROFILE_SAMPLE_RATE of requests are profiled
+# profiled requests count their statements and flag any statement run
+# SQL_N_PLUS_ONE_THRESHOLD or more times (an N+1). in either mode, statements slower
+# than SQL_SLOW_QUERY_MS are logged with the route and the app frame that ran them.
+# with SQL_PROFILE=off no engine hooks are installed.
+PROFILE_MODES = ("off", "dev", "sampled")
+
+SQL_QUERIES = Histogram(
+    "motif_sql_queries_per_request",
+    "Statements run by profiled requests.",
+    ("blueprint", "route"),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+SQL_SLOW_QUERIES = Counter(
+    "motif_sql_slow_queries_total",
+    "Statements slower than SQL_SLOW_QUERY_MS.",
+    ("route",),
+)
+SQL_N_PLUS_ONE = Counter(
+    "motif_sql_n_plus_one_total",
+    "Statements repeated at least SQL_N_PLUS_ONE_THRESHOLD times in one profiled request.",
+    ("route",),
+)
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_settings = {}
+_hooks_installed = False
+
+
+def _route():
+    if not has_request_context():
+        return "-"
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def _origin():
+    # innermost frame in the app's own code, skipping this module
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR + os.sep) and filename != __file__:
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return "<unknown>"
+
+
+def _start_profile():
+    mode = _settings["mode"]
+    if mode == "dev" or (mode == "sampled" and random.random() < _settings["sample_rate"]):
+        g._sql_profile = {"count": 0, "seconds": 0.0, "shapes": Tally(), "origins": {}}
+
+
+def _add_server_timing(response):
+    profile = g.get("_sql_profile")
+    if profile is not None and _settings["mode"] == "dev":
+        response.headers.add(
+            "Server-Timing", f'db;dur={profile["seconds"] * 1000:.1f};desc="{profile["count"]} queries"'
+        )
+    return response
+
+
+def _finish_profile(exception):
+    profile = g.pop("_sql_profile", None)
+    if profile is None:
+        return
+
+    route = _route()
+    SQL_QUERIES.observe(profile["count"], blueprint=request.blueprint or "", route=route)
+
+    threshold = _settings["n_plus_one_threshold"]
+    for statement, count in profile["shapes"].items():
+        if count >= threshold:
+            SQL_N_PLUS_ONE.inc(route=route)
+            logger.warning(
+                "possible N+1 on %s %s: %d runs from %s of %s",
+                request.method, route, count,
+                profile["origins"].get(statement, "<unknown>"), " ".join(statement.split()),
+            )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_sql_profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["_sql_profile_started"].pop()
+
+    if seconds * 1000 >= _settings["slow_query_ms"]:
+        route = _route()
+        SQL_SLOW_QUERIES.inc(route=route)
+        logger.warning(
+            "slow query (%.1f ms) on %s from %s: %s",
+            seconds * 1000, route, _origin(), " ".join(statement.split()),
+        )
+
+    profile = g.get("_sql_profile") if has_request_context() else None
+    if profile is not None:
+        profile["count"] += 1
+        profile["seconds"] += seconds
+        # bound parameters aren't part of the statement, so a repeated string is a
+        # repeated shape; the origin is taken once, when it first looks like an N+1
+        shapes = profile["shapes"]
+        shapes[statement] += 1
+        if shapes[statement] == _settings["n_plus_one_threshold"]:
+            profile["origins"][statement] = _origin()
+
+
+def _query_failed(context):
+    started = context.connection.info.get("_sql_profile_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def init_sql_profile(app):
+    global _hooks_installed
+
+    mode = app.config['SQL_PROFILE']
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"SQL_PROFILE must be one of {', '.join(PROFILE_MODES)}")
+    if mode == "off":
+        return
+
+    _settings.update(
+        mode=mode,
+        sample_rate=app.config['SQL_PROFILE_SAMPLE_RATE'],
+        slow_query_ms=app.config['SQL_SLOW_QUERY_MS'],
+        n_plus_one_threshold=app.config['SQL_N_PLUS_ONE_THRESHOLD'],
+    )
+
+    app.before_request(_start_profile)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_finish_profile)
+
+    if not _hooks_installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _query_failed)
+        _hooks_installed = True
@@ -0,0 +1,83 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models import Tombstone
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, literal, select
+import click
+
+
+# changes are matched from a little before the client's token so a write that
+# committed just after the token was issued, but was timestamped before it, is
+# still picked up. clients apply changes by id, so the overlap is harmless.
+SYNC_CLOCK_SKEW = timedelta(seconds=5)
+
+
+def sync_token(now=None):
+    # a utc timestamp with a Z suffix, so it can go in a query string unescaped.
+    # naive values (sqlite drops the offset) are already utc.
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo:
+        now = now.astimezone(timezone.utc)
+
+    return now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def decode_sync_token(token):
+    try:
+        since = datetime.fromisoformat(token)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid sync token") from e
+
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+
+def changed_after(since):
+    return since - SYNC_CLOCK_SKEW
+
+
+def tombstone_horizon():
+    return datetime.now(timezone.utc) - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+
+
+def needs_full_sync(since):
+    # deletions before the horizon may already have been pruned
+    return since is None or changed_after(since) < tombstone_horizon()
+
+
+def record_tombstones(entity, entity_id, parent_id, spotify_id, *criteria):
+    # copies the matching rows' columns into tombstones with one INSERT ... SELECT.
+    # does not commit; run it before the delete is flushed.
+    db.session.execute(insert(Tombstone).from_select(
+        ["entity", "entity_id", "parent_id", "spotify_id", "deleted_date"],
+        select(
+            literal(entity), entity_id, parent_id, spotify_id, literal(datetime.now(timezone.utc))
+        ).where(
+            *criteria
+        ),
+    ))
+
+
+def removed_since(entity, parent_id, since):
+    return db.session.query(
+        Tombstone.entity_id, Tombstone.spotify_id
+    ).filter(
+        Tombstone.entity == entity,
+        Tombstone.parent_id == parent_id,
+        Tombstone.deleted_date >= changed_after(since),
+    ).order_by(
+        Tombstone.id
+    ).all()
+
+
+def prune_tombstones():
+    result = db.session.execute(delete(Tombstone).where(Tombstone.deleted_date < tombstone_horizon()))
+    db.session.commit()
+
+    return result.rowcount
+
+
+@click.command("prune-tombstones")
+@with_appcontext
+def prune_tombstones_command():
+    click.echo(f"pruned {prune_tombstones()} tombstones")
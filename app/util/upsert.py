@@ -0,0 +1,13 @@
+from app import db
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# both dialects' insert() support on_conflict_do_nothing / on_conflict_do_update
+def dialect_insert(model):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+
+    raise NotImplementedError(f'upserts are not supported for the {dialect} dialect')
@@ -0,0 +1,143 @@
+"""Encoding cost of representative api payloads: flask's stdlib provider vs FastJSONProvider.
+
+    python -m benchmarks.bench_json --scale 1 --repeat 20
+
+Each payload is rendered through provider.response(), as jsonify does, and both
+providers' bodies are checked to decode to the same value.
+"""
+from benchmarks.common import report
+from benchmarks.spotify_stub import album, artist
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+
+
+def artist_profile_payload(scale):
+    # the shape fetch_artist_profile returns
+    albums = [album(f"artist0-album{n}") for n in range(20 * scale)]
+    grouped = {"album": [], "compilation": [], "single": []}
+    for document in albums:
+        grouped[document["album_type"]].append({
+            "title": document["name"],
+            "spotifyId": document["id"],
+            "albumType": document["album_type"],
+            "releaseDate": document["release_date"],
+            "popularity": document["popularity"],
+            "images": document["images"],
+            "tracks": [
+                {
+                    "title": track["name"],
+                    "spotifyId": track["id"],
+                    "durationMs": track["duration_ms"],
+                    "discNumber": track["disc_number"],
+                    "trackNumber": track["track_number"],
+                    "explicit": track["explicit"],
+                    "isPlayable": track["is_playable"],
+                }
+                for track in document["tracks"]["items"]
+            ],
+        })
+    profile = artist("artist0")
+
+    return {
+        "title": profile["name"],
+        "popularity": profile["popularity"],
+        "spotifyId": profile["id"],
+        "images": profile["images"],
+        "albums": grouped["album"],
+        "compilations": grouped["compilation"],
+        "singles": grouped["single"],
+    }
+
+
+def catalog_payload(scale):
+    # the shape build_catalog_document caches, dates already as iso strings
+    now = datetime.now(timezone.utc)
+    return {
+        "id": 1,
+        "name": "A catalog with a name",
+        "comment": "and a comment — with some unicode",
+        "isPrivate": False,
+        "created_date": now.isoformat(),
+        "updated_date": now.isoformat(),
+        "items": [
+            {
+                "id": n,
+                "spotify_id": f"item0x{n}",
+                "spotify_artist_id": "artist0",
+                "position": (n + 1) * 1024,
+                "comment": f"pick {n}",
+                "created_date": (now - timedelta(minutes=n)).isoformat(),
+                "updated_date": (now - timedelta(minutes=n)).isoformat(),
+                "type": "album",
+                "title": f"Album {n}",
+                "artist_name": "Artist 0",
+                "image_url": f"https://img.local/item0x{n}/300",
+            }
+            for n in range(500 * scale)
+        ],
+    }
+
+
+def reviews_payload(scale):
+    # review rows with datetime values, which the providers render as http dates
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "comment": f"review {n} with a few words of commentary",
+            "createdDate": now - timedelta(hours=n),
+            "downvotes": 0,
+            "id": n,
+            "isPrivate": n % 3 == 0,
+            "rating": n % 10,
+            "spotifyArtistId": f"artist{n % 50}",
+            "spotifyId": f"item{n % 50}x{n}",
+            "updatedDate": now - timedelta(hours=n),
+            "upvotes": n % 7,
+            "userId": 1,
+        }
+        for n in range(2000 * scale)
+    ]
+
+
+PAYLOADS = {
+    "artist profile": artist_profile_payload,
+    "catalog document": catalog_payload,
+    "current user reviews": reviews_payload,
+}
+
+
+def main():
+    from app.util.json_provider import FastJSONProvider, orjson
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; FastJSONProvider falls back to the stdlib encoder\n")
+
+    app = Flask(__name__)
+    providers = {"stdlib": DefaultJSONProvider(app), "fast": FastJSONProvider(app)}
+
+    with app.app_context():
+        for payload_name, build in PAYLOADS.items():
+            payload = build(args.scale)
+            bodies = {name: provider.response(payload).get_data() for name, provider in providers.items()}
+            assert json.loads(bodies["stdlib"]) == json.loads(bodies["fast"]), payload_name
+
+            for name, provider in providers.items():
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    provider.response(payload)
+                    best = min(best, time.perf_counter() - start)
+                report(f"{payload_name} ({name}, {len(bodies[name]) // 1024} KiB)", 1, best, unit="responses")
+
+
+if __name__ == "__main__":
+    main()
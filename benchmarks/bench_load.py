@@ -0,0 +1,385 @@
+"""Throughput and latency of the whole api under a fixed-concurrency request mix.
+
+    python -m benchmarks.bench_load --users 200 --concurrency 16 --duration 30
+    python -m benchmarks.bench_load --save-baseline load-baseline.json
+    python -m benchmarks.bench_load --baseline load-baseline.json --tolerance 0.25
+
+Seeds a fresh database at the given scale, serves the app with werkzeug's threaded
+server against benchmarks.spotify_stub, and drives it over http from --concurrency
+clients, each logged in as a seeded user and running weighted scenarios from --mix.
+Reports throughput and p50/p95/p99 per endpoint. With --baseline it exits 1 when an
+endpoint's p95 or the overall throughput is worse than the baseline by more than
+--tolerance; baselines are only comparable on the same machine, scale and mix.
+"""
+from benchmarks.common import create_bench_app, seed_client_user, seed_music_items
+from benchmarks.spotify_stub import start_spotify_stub
+from collections import defaultdict
+from datetime import datetime, timezone
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import requests
+import statistics
+import sys
+import threading
+import time
+
+
+PASSWORD = "load-test-password"
+DEFAULT_MIX = "login=1,search=2,artist=2,reviews=2,catalogs=3"
+
+
+def seed_load(args):
+    from app import db
+    from app.models import Catalog, CatalogItem, Follow, Review, User
+    from app.util.item_metadata import refresh_all_item_metadata
+    from app.util.passwords import hash_password
+    from sqlalchemy import func, insert, select, update
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+
+    seed_client_user()
+    items = seed_music_items(args.artists, args.items_per_artist)
+
+    password_hash = hash_password(PASSWORD)
+    db.session.execute(insert(User), [
+        {"username": f"load{n}", "email": f"load{n}@motif.local", "password_hash": password_hash, "display_name": f"Load {n}"}
+        for n in range(args.users)
+    ])
+    emails = dict(db.session.execute(select(User.id, User.email).where(User.username.startswith("load")).order_by(User.id)).all())
+    user_ids = list(emails)
+
+    db.session.execute(insert(Review), [
+        {
+            "user_id": user_id,
+            "spotify_id": spotify_id,
+            "spotify_artist_id": spotify_artist_id,
+            "rating": rng.randint(0, 10),
+            "comment": f"review of {spotify_id} by load user {user_id}",
+            "is_private": rng.random() < 0.2,
+            "created_date": now,
+            "updated_date": now,
+        }
+        for user_id in user_ids
+        for spotify_id, spotify_artist_id in rng.sample(items, min(args.reviews_per_user, len(items)))
+    ])
+
+    db.session.execute(insert(Catalog), [
+        {"user_id": user_id, "name": f"Catalog {n} of load user {user_id}", "comment": "load test catalog", "is_private": n == 0}
+        for user_id in user_ids
+        for n in range(args.catalogs_per_user)
+    ])
+    catalogs = db.session.execute(select(Catalog.id, Catalog.user_id, Catalog.is_private)).all()
+    db.session.execute(insert(CatalogItem), [
+        {
+            "catalog_id": catalog.id,
+            "spotify_id": spotify_id,
+            "spotify_artist_id": spotify_artist_id,
+            "position": (position + 1) * 1024,
+            "comment": f"pick {position}",
+        }
+        for catalog in catalogs
+        for position, (spotify_id, spotify_artist_id) in enumerate(rng.sample(items, min(args.items_per_catalog, len(items))))
+    ])
+
+    db.session.execute(insert(Follow), [
+        {"follower_id": follower_id, "followee_id": followee_id}
+        for follower_id in user_ids
+        for followee_id in rng.sample(user_ids, min(args.follows_per_user, len(user_ids)))
+        if followee_id != follower_id
+    ])
+    db.session.execute(update(User).values(
+        follower_count=select(func.count()).where(Follow.followee_id == User.id).scalar_subquery()
+    ))
+    db.session.commit()
+
+    refresh_all_item_metadata()
+
+    return {
+        "user_ids": user_ids,
+        "emails": emails,
+        "artist_ids": sorted({spotify_artist_id for _, spotify_artist_id in items}),
+        "public_catalogs": [(catalog.id, catalog.user_id) for catalog in catalogs if not catalog.is_private],
+    }
+
+
+class LoadClient:
+    # one keep-alive connection per client. the app's cookies are marked Secure, which
+    # requests won't send over plain http, so they're carried by hand
+    def __init__(self, base_url, samples, recording):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.cookies = {}
+        self.samples = samples
+        self.recording = recording
+
+    def call(self, label, method, path, **kwargs):
+        headers = {"X-CSRF-TOKEN": self.cookies.get("csrf_access_token", "")}
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, cookies=self.cookies, headers=headers, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 0
+        seconds = time.perf_counter() - start
+
+        if self.recording.is_set():
+            self.samples.append((label, seconds, status))
+        if response is not None:
+            self.cookies.update(response.cookies.get_dict())
+        return response
+
+    def login(self, email):
+        return self.call("POST /api/auth/login", "POST", "/api/auth/login", json={"email": email, "password": PASSWORD})
+
+
+def scenario_login(client, context, rng, worker):
+    client.login(context["emails"][rng.choice(context["user_ids"])])
+    client.call("GET /api/auth/verify", "GET", "/api/auth/verify")
+
+
+def scenario_search(client, context, rng, worker):
+    term = rng.choice(("review", "catalog", "load", "pick"))
+    client.call("GET /api/catalogs/search", "GET", "/api/catalogs/search", params={"q": term})
+    client.call("GET /api/reviews/search", "GET", "/api/reviews/search", params={"q": term})
+    client.call("GET /api/spotify/search", "GET", "/api/spotify/search", params={
+        "q": term, "type": "album,artist,track", "limit": 10, "offset": 0,
+    })
+
+
+def scenario_artist(client, context, rng, worker):
+    artist_id = rng.choice(context["artist_ids"])
+    client.call("GET /api/spotify/artist-profile", "GET", "/api/spotify/artist-profile", params={"id": artist_id})
+    client.call("GET /api/reviews/artist/<id>", "GET", f"/api/reviews/artist/{artist_id}")
+    client.call("GET /api/catalogs/artist/<id>", "GET", f"/api/catalogs/artist/{artist_id}")
+
+
+def scenario_reviews(client, context, rng, worker):
+    # reviews an item the database hasn't seen, so creation goes out to spotify once
+    response = client.call("POST /api/reviews/", "POST", "/api/reviews/", json={
+        "spotifyId": f"load-{worker}-{next(context['item_counter'])}",
+        "spotifyArtistId": rng.choice(context["artist_ids"]),
+        "rating": rng.randint(0, 10),
+        "comment": "written during the load test",
+        "isPrivate": False,
+    })
+    client.call("GET /api/reviews/", "GET", "/api/reviews/")
+    if response is None or response.status_code != 201:
+        return
+
+    review_id = response.json()["id"]
+    client.call("PUT /api/reviews/<id>", "PUT", f"/api/reviews/{review_id}", json={"rating": rng.randint(0, 10)})
+    client.call("DELETE /api/reviews/<id>", "DELETE", f"/api/reviews/{review_id}")
+
+
+def scenario_catalogs(client, context, rng, worker):
+    catalog_id, owner_id = rng.choice(context["public_catalogs"])
+    client.call("GET /api/catalogs/<id>", "GET", f"/api/catalogs/{catalog_id}")
+    client.call("GET /api/catalogs/<id>/header", "GET", f"/api/catalogs/{catalog_id}/header")
+    client.call("GET /api/catalogs/<id>/items", "GET", f"/api/catalogs/{catalog_id}/items")
+    client.call("GET /api/user/<id>/profile", "GET", f"/api/user/{owner_id}/profile")
+    client.call("GET /api/feed/", "GET", "/api/feed/")
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "search": scenario_search,
+    "artist": scenario_artist,
+    "reviews": scenario_reviews,
+    "catalogs": scenario_catalogs,
+}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def run_load(base_url, context, args):
+    weights = parse_mix(args.mix)
+    names, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    recording, stop = threading.Event(), threading.Event()
+    samples = [[] for _ in range(args.concurrency)]
+    iterations = [0] * args.concurrency
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = LoadClient(base_url, samples[index], recording)
+        client.login(context["emails"][context["user_ids"][index % len(context["user_ids"])]])
+        while not stop.is_set():
+            SCENARIOS[rng.choices(names, cum_weights=cumulative)[0]](client, context, rng, index)
+            if recording.is_set():
+                iterations[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recording.set()
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    recording.clear()
+    seconds = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return [sample for worker_samples in samples for sample in worker_samples], seconds, sum(iterations)
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank on pre-sorted values
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def summarize(samples, seconds):
+    by_label = defaultdict(list)
+    errors = defaultdict(int)
+    for label, latency, status in samples:
+        by_label[label].append(latency)
+        if status == 0 or status >= 500:
+            errors[label] += 1
+
+    endpoints = {}
+    for label, latencies in sorted(by_label.items()):
+        latencies.sort()
+        endpoints[label] = {
+            "count": len(latencies),
+            "errors": errors[label],
+            "rps": len(latencies) / seconds,
+            "p50": percentile(latencies, .50),
+            "p95": percentile(latencies, .95),
+            "p99": percentile(latencies, .99),
+            "mean": statistics.fmean(latencies),
+        }
+
+    return {
+        "requests": len(samples),
+        "errors": sum(errors.values()),
+        "rps": len(samples) / seconds,
+        "endpoints": endpoints,
+    }
+
+
+def compare(result, baseline, tolerance, min_count):
+    # [(what, baseline value, current value)] for everything past tolerance
+    regressions = []
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(("throughput (req/s)", baseline["rps"], result["rps"]))
+    for label, current in result["endpoints"].items():
+        previous = baseline["endpoints"].get(label)
+        if previous is None or min(current["count"], previous["count"]) < min_count:
+            continue
+        if current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append((f"{label} p95 (ms)", previous["p95"] * 1000, current["p95"] * 1000))
+
+    return regressions
+
+
+def print_report(result, seconds, iterations, baseline=None):
+    print(f"\n{result['requests']} requests ({iterations} scenarios) in {seconds:.1f}s, "
+          f"{result['rps']:,.1f} req/s, {result['errors']} errors")
+    if baseline:
+        print(f"baseline: {baseline['rps']:,.1f} req/s")
+
+    header = f"{'endpoint':<36} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print("\n" + header + ("  p95 vs baseline" if baseline else ""))
+    for label, stats in result["endpoints"].items():
+        line = (
+            f"{label:<36} {stats['count']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50'] * 1000:>8.1f} {stats['p95'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f}"
+        )
+        previous = baseline["endpoints"].get(label) if baseline else None
+        if previous:
+            line += f"  {(stats['p95'] / previous['p95'] - 1) * 100:+6.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    scale = parser.add_argument_group("scale")
+    scale.add_argument("--users", type=int, default=100)
+    scale.add_argument("--artists", type=int, default=50)
+    scale.add_argument("--items-per-artist", type=int, default=40)
+    scale.add_argument("--reviews-per-user", type=int, default=20)
+    scale.add_argument("--catalogs-per-user", type=int, default=3)
+    scale.add_argument("--items-per-catalog", type=int, default=25)
+    scale.add_argument("--follows-per-user", type=int, default=10)
+    run = parser.add_argument_group("run")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--duration", type=float, default=20, help="seconds measured")
+    run.add_argument("--warmup", type=float, default=3, help="seconds run before measuring")
+    run.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights, default {DEFAULT_MIX}")
+    run.add_argument("--spotify-latency-ms", type=float, default=0)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--database-url", default=None, help="defaults to a temporary sqlite file")
+    baselines = parser.add_argument_group("baseline")
+    baselines.add_argument("--baseline", help="compare against this file; exit 1 on regressions")
+    baselines.add_argument("--save-baseline", help="write this run's results here")
+    baselines.add_argument("--tolerance", type=float, default=0.2)
+    baselines.add_argument("--min-count", type=int, default=20, help="ignore endpoints with fewer samples")
+    args = parser.parse_args()
+
+    stub, stub_url = start_spotify_stub(latency_ms=args.spotify_latency_ms)
+    os.environ["SPOTIFY_API_URL"] = f"{stub_url}/v1"
+    os.environ["SPOTIFY_ACCOUNTS_URL"] = stub_url
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    app = create_bench_app(args.database_url)
+    with app.app_context():
+        start = time.perf_counter()
+        context = seed_load(args)
+        print(f"seeded {len(context['user_ids'])} users, {len(context['artist_ids'])} artists, "
+              f"{len(context['public_catalogs'])} public catalogs in {time.perf_counter() - start:.1f}s")
+    context["item_counter"] = itertools.count()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    samples, seconds, iterations = run_load(f"http://127.0.0.1:{server.server_port}", context, args)
+    server.shutdown()
+    stub.shutdown()
+
+    result = summarize(samples, seconds)
+    result["settings"] = {
+        key: value for key, value in vars(args).items()
+        if key not in ("baseline", "save_baseline", "tolerance", "min_count", "database_url")
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != result["settings"]:
+            print("warning: baseline was recorded with different settings", file=sys.stderr)
+
+    print_report(result, seconds, iterations, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.save_baseline}")
+
+    if baseline:
+        regressions = compare(result, baseline, args.tolerance, args.min_count)
+        if regressions:
+            print(f"\nregressions beyond {args.tolerance:.0%}:")
+            for what, previous, current in regressions:
+                print(f"  {what:<44} {previous:>10.1f} -> {current:>10.1f}")
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
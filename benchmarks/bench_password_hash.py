@@ -0,0 +1,90 @@
+"""Cost of each password hash method, and how the hashing pool behaves under a login burst.
+
+    python -m benchmarks.bench_password_hash --target-ms 250
+    python -m benchmarks.bench_password_hash --burst 200 --threads 64
+
+Pick the strongest method under the target and set PASSWORD_HASH_METHOD to it; users
+are moved onto it as they next log in.
+"""
+from benchmarks.common import create_bench_app, report, timed
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+
+
+CANDIDATE_METHODS = (
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+    "scrypt:131072:8:1",
+)
+
+
+def hash_costs(methods, samples):
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    costs = {}
+    for method in methods:
+        password_hash = generate_password_hash("correct horse battery staple", method)
+        costs[method] = statistics.median(
+            timed(check_password_hash, password_hash, "correct horse battery staple")[0]
+            for _ in range(samples)
+        )
+
+    return costs
+
+
+def burst(app, count, threads):
+    from app.util.passwords import PasswordHasherBusy, hash_password, verify_password
+
+    with app.app_context():
+        password_hash = hash_password("correct horse battery staple")
+
+    def login():
+        with app.app_context():
+            try:
+                return verify_password(password_hash, "correct horse battery staple")
+            except PasswordHasherBusy:
+                return None
+
+    with ThreadPoolExecutor(max_workers=threads) as callers:
+        seconds, results = timed(lambda: list(callers.map(lambda _: login(), range(count))))
+
+    return seconds, sum(result is True for result in results), sum(result is None for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    costs = hash_costs(CANDIDATE_METHODS, args.samples)
+    for method, seconds in costs.items():
+        print(f"{method:<40} {seconds * 1000:8.1f} ms per check")
+
+    within_target = [method for method, seconds in costs.items() if seconds * 1000 <= args.target_ms]
+    if within_target:
+        # candidates are listed weakest first within each family; prefer scrypt for memory hardness
+        scrypt = [method for method in within_target if method.startswith("scrypt")]
+        print(f"\nrecommended PASSWORD_HASH_METHOD={(scrypt or within_target)[-1]}")
+    else:
+        print(f"\nno candidate checks in under {args.target_ms:.0f} ms on this machine")
+
+    app = create_bench_app()
+    config = app.config
+    seconds, accepted, rejected = burst(app, args.burst, args.threads)
+    print(
+        f"\nburst of {args.burst} from {args.threads} threads, {config['PASSWORD_HASH_WORKERS']} workers, "
+        f"{config['PASSWORD_HASH_MAX_PENDING']} pending, {config['PASSWORD_HASH_METHOD']}"
+    )
+    report("verified", accepted, seconds, unit="logins")
+    print(f"{'rejected with 503':<40} {rejected:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of review import/export: per-review POSTs vs NDJSON bulk import, and streaming export.
+
+    python -m benchmarks.bench_review_bulk --reviews 2000
+"""
+from benchmarks.common import authed_client, create_bench_app, report, seed_client_user, seed_music_items, seed_user, timed
+import argparse
+import json
+
+
+def post_one_by_one(client, items):
+    for spotify_id, spotify_artist_id in items:
+        response = client.post("/api/reviews/", json={
+            "spotifyId": spotify_id,
+            "spotifyArtistId": spotify_artist_id,
+            "rating": 7,
+            "comment": "one at a time",
+            "isPrivate": False,
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+
+def bulk_import(client, items):
+    body = "\n".join(
+        json.dumps({
+            "spotifyId": spotify_id,
+            "spotifyArtistId": spotify_artist_id,
+            "rating": 7,
+            "comment": "bulk",
+            "isPrivate": False,
+        })
+        for spotify_id, spotify_artist_id in items
+    )
+    response = client.post("/api/reviews/import", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def export(client):
+    response = client.get("/api/reviews/export")
+    return sum(1 for line in response.iter_encoded() for _ in line.splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    with app.app_context():
+        seed_client_user()
+        items = seed_music_items(max(1, args.reviews // 20), 20)[:args.reviews]
+        single_user = seed_user("single")
+        bulk_user = seed_user("bulk")
+
+    single_client = authed_client(app, single_user)
+    bulk_client = authed_client(app, bulk_user)
+
+    seconds, _ = timed(post_one_by_one, single_client, items)
+    report("POST /api/reviews/ (one per review)", len(items), seconds)
+
+    seconds, summary = timed(bulk_import, bulk_client, items)
+    report("POST /api/reviews/import (ndjson)", summary["created"], seconds)
+
+    seconds, _ = timed(bulk_import, bulk_client, items)
+    report("POST /api/reviews/import (all conflicts)", len(items), seconds)
+
+    seconds, count = timed(export, bulk_client)
+    report("GET /api/reviews/export (ndjson)", count, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Rows/second of the public review listing: per-row dicts + jsonify vs tuple-based encoding.
+
+    python -m benchmarks.bench_review_listing --reviews 20000
+"""
+from benchmarks.common import create_bench_app, report, seed_music_items, seed_user, timed
+from collections import defaultdict
+from datetime import datetime, timezone
+import argparse
+import json
+
+
+def legacy_artist_reviews(artist_id):
+    # the per-endpoint implementation review_listing replaced, kept here as the baseline
+    from app import db
+    from app.models import Review, User
+    from flask import jsonify
+    from sqlalchemy.sql import desc
+
+    sorted_reviews_query = (
+        db.session.query(
+            Review.id.label("review_id"),
+            Review.spotify_id,
+            Review.user_id,
+            Review.comment,
+            Review.rating,
+            Review.created_date,
+            Review.updated_date,
+            Review.upvotes,
+            Review.is_private,
+            User.username,
+            User.display_name,
+        ).join(
+            User, Review.user_id == User.id
+        ).filter(
+            Review.spotify_artist_id == artist_id,
+            Review.is_private.is_(False),
+        ).order_by(
+            desc(Review.upvotes),
+            desc(Review.created_date),
+        )
+    )
+    reviews = defaultdict(list)
+    for review in sorted_reviews_query:
+        reviews[review.spotify_id].append({
+            "spotifyId": review.spotify_id,
+            "reviewId": review.review_id,
+            "userId": review.user_id,
+            "comment": review.comment,
+            "rating": review.rating,
+            "createdDate": review.created_date,
+            "updatedDate": review.updated_date,
+            "upvotes": review.upvotes,
+            "username": review.username,
+            "displayName": review.display_name,
+        })
+    return jsonify(dict(reviews)).get_data()
+
+
+def encoded_artist_reviews(artist_id):
+    from app.util.review_listing import artist_public_reviews_query, encode_grouped_reviews
+
+    return encode_grouped_reviews(artist_public_reviews_query(artist_id))
+
+
+def seed_reviews(review_count, users, items):
+    from app import db
+    from app.models import Review
+    from sqlalchemy import insert
+
+    now = datetime.now(timezone.utc)
+    db.session.execute(insert(Review), [
+        {
+            "user_id": users[i % len(users)],
+            "spotify_id": items[(i // len(users)) % len(items)][0],
+            "spotify_artist_id": "artist0",
+            "rating": i % 10,
+            "comment": f"review {i} with a few words of commentary — and some unicode",
+            "is_private": False,
+            "created_date": now,
+            "updated_date": now,
+            "upvotes": i % 7,
+            "downvotes": 0,
+        }
+        for i in range(review_count)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+    with app.app_context():
+        items = seed_music_items(1, 200)
+        users = [seed_user(f"user{u}") for u in range(100)]
+        seed_reviews(args.reviews, users, items)
+
+    with app.test_request_context():
+        # the listing has since gained the item metadata snapshot; compare the fields both produce
+        legacy = json.loads(legacy_artist_reviews("artist0"))
+        encoded = json.loads(encoded_artist_reviews("artist0"))
+        assert legacy == {
+            spotify_id: [{key: review[key] for key in group[0]} for review in encoded[spotify_id]]
+            for spotify_id, group in legacy.items()
+        }
+
+        for name, fn in (("dict rows + jsonify", legacy_artist_reviews), ("tuple rows + encode_grouped_reviews", encoded_artist_reviews)):
+            best = min(timed(fn, "artist0")[0] for _ in range(args.repeat))
+            report(name, args.reviews, best)
+
+
+if __name__ == "__main__":
+    main()
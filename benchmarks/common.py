@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import time
+
+
+# config.Config reads DATABASE_URL at import time, so the app (and config) must
+# not be imported before create_bench_app sets it
+def create_bench_app(database_url=None):
+    if database_url is None:
+        fd, path = tempfile.mkstemp(prefix="motif-bench-", suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    return app
+
+
+def seed_client_user():
+    from app import db
+    from app.models import User
+
+    # get_client_token looks up user -1; a far-off expiry keeps it from calling spotify
+    db.session.add(User(
+        id=-1,
+        username="spotify-client",
+        email="spotify-client@motif.local",
+        password_hash="!",
+        spotify_access_token="bench-token",
+        spotify_token_expires=datetime.now(timezone.utc) + timedelta(days=365),
+    ))
+    db.session.commit()
+
+
+def seed_user(username, password_hash="!"):
+    from app import db
+    from app.models import User
+
+    user = User(username=username, email=f"{username}@motif.local", password_hash=password_hash)
+    db.session.add(user)
+    db.session.commit()
+
+    return user.id
+
+
+def seed_music_items(artist_count, items_per_artist):
+    from app import db
+    from app.models import Artist, ArtistAlbumTrack
+    from sqlalchemy import insert
+
+    db.session.execute(insert(Artist), [
+        {"spotify_id": f"artist{a}", "title": f"Artist {a}", "image_url_160px": f"https://img.local/a{a}"}
+        for a in range(artist_count)
+    ])
+    artist_ids = dict(db.session.query(Artist.spotify_id, Artist.id).all())
+
+    rows = []
+    items = []
+    for a in range(artist_count):
+        artist_spotify_id = f"artist{a}"
+        rows.append({"artist_id": artist_ids[artist_spotify_id], "spotify_id": artist_spotify_id})
+        for i in range(items_per_artist):
+            spotify_id = f"item{a}x{i}"
+            rows.append({"artist_id": artist_ids[artist_spotify_id], "spotify_id": spotify_id})
+            items.append((spotify_id, artist_spotify_id))
+    db.session.execute(insert(ArtistAlbumTrack), rows)
+    db.session.commit()
+
+    return items
+
+
+def authed_client(app, user_id):
+    from flask_jwt_extended import create_access_token, get_csrf_token
+
+    # the test client's cookie jar replaces any Cookie header, so the token goes in the jar
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+        csrf_token = get_csrf_token(token)
+
+    client = app.test_client()
+    client.set_cookie("access_token_cookie", token)
+    client.environ_base["HTTP_X_CSRF_TOKEN"] = csrf_token
+
+    return client
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def report(name, count, seconds, unit="rows"):
+    rate = count / seconds if seconds else float("inf")
+    print(f"{name:<40} {count:>8} {unit} in {seconds:8.3f}s  {rate:>12,.0f} {unit}/s")
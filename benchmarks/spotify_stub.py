@@ -0,0 +1,168 @@
+"""A local stand-in for the parts of the Spotify API the app calls.
+
+    python -m benchmarks.spotify_stub --port 8099 --latency-ms 40
+    SPOTIFY_API_URL=http://127.0.0.1:8099/v1 SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8099 flask run
+
+Every id resolves to a deterministic fake artist, album or track, so benchmarks get
+stable payload sizes without network access or credentials. --latency-ms delays each
+response to stand in for the round trip to Spotify.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import threading
+import time
+
+
+ALBUMS_PER_ARTIST = 12
+TRACKS_PER_ALBUM = 10
+
+
+def _images(seed, sizes):
+    return [{"url": f"https://img.local/{seed}/{size}", "height": size, "width": size} for size in sizes]
+
+
+def artist(artist_id):
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id}",
+        "popularity": sum(map(ord, artist_id)) % 100,
+        "genres": ["stub"],
+        "images": _images(artist_id, (640, 320, 160)),
+    }
+
+
+def track(track_id, album_id, number=1):
+    return {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "duration_ms": 180000 + number * 1000,
+        "disc_number": 1,
+        "track_number": number,
+        "explicit": False,
+        "is_playable": True,
+        "popularity": number,
+        "artists": [{"id": f"{album_id}-artist", "name": f"Artist {album_id}"}],
+    }
+
+
+def album(album_id, with_tracks=True, with_release_date=True):
+    document = {
+        "id": album_id,
+        "name": f"Album {album_id}",
+        "album_type": ("album", "single", "compilation")[sum(map(ord, album_id)) % 3],
+        "total_tracks": TRACKS_PER_ALBUM,
+        "popularity": sum(map(ord, album_id)) % 100,
+        "images": _images(album_id, (640, 300, 64)),
+        "artists": [{"id": f"{album_id}-artist", "name": f"Artist {album_id}"}],
+    }
+    # the app stores a single album's release_date in a Date column as sent, which
+    # sqlite rejects as a string, so lookups that get ingested leave it out
+    if with_release_date:
+        document["release_date"] = "2020-01-01"
+    if with_tracks:
+        document["tracks"] = {
+            "items": [track(f"{album_id}-t{n}", album_id, n) for n in range(1, TRACKS_PER_ALBUM + 1)]
+        }
+    return document
+
+
+def search(query, limit, offset):
+    ids = [f"{query}-{n}" for n in range(offset, offset + limit)]
+    return {
+        "albums": {"items": [album(f"album-{item_id}", with_tracks=False) for item_id in ids]},
+        "artists": {"items": [artist(f"artist-{item_id}") for item_id in ids]},
+        "tracks": {"items": [
+            {**track(f"track-{item_id}", f"album-{item_id}"), "album": album(f"album-{item_id}", with_tracks=False)}
+            for item_id in ids
+        ]},
+    }
+
+
+class SpotifyStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        if self.latency:
+            time.sleep(self.latency)
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path == "/api/token":
+            return self._send(200, {
+                "access_token": "stub-access-token",
+                "refresh_token": "stub-refresh-token",
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            })
+        self._send(404, {"error": {"status": 404, "message": "Not found"}})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        args = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if parts[:1] != ["v1"]:
+            return self._send(404, {"error": {"status": 404, "message": "Not found"}})
+        parts = parts[1:]
+
+        if parts == ["me"]:
+            return self._send(200, {"id": "stub-user", "display_name": "Stub User", "email": "stub@motif.local"})
+        if parts == ["search"]:
+            return self._send(200, search(args.get("q", ""), int(args.get("limit", 20)), int(args.get("offset", 0))))
+        if len(parts) == 2 and parts[0] == "artists":
+            return self._send(200, artist(parts[1]))
+        if len(parts) == 3 and parts[0] == "artists" and parts[2] == "albums":
+            return self._send(200, {"items": [
+                album(f"{parts[1]}-album{n}", with_tracks=False) for n in range(ALBUMS_PER_ARTIST)
+            ]})
+        if parts == ["albums"]:
+            return self._send(200, {"albums": [album(album_id) for album_id in args.get("ids", "").split(",") if album_id]})
+        if len(parts) == 2 and parts[0] == "albums":
+            return self._send(200, album(parts[1], with_release_date=False))
+        if len(parts) == 2 and parts[0] == "tracks":
+            return self._send(200, {
+                **track(parts[1], f"{parts[1]}-album"),
+                "album": album(f"{parts[1]}-album", with_tracks=False, with_release_date=False),
+            })
+
+        self._send(404, {"error": {"status": 404, "message": "Not found"}})
+
+
+def start_spotify_stub(port=0, latency_ms=0):
+    # serves on a daemon thread; returns (server, base url)
+    handler = type("SpotifyStub", (SpotifyStubHandler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server, url = start_spotify_stub(args.port, args.latency_ms)
+    print(f"SPOTIFY_API_URL={url}/v1 SPOTIFY_ACCOUNTS_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
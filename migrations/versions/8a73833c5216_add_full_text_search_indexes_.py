@@ -0,0 +1,45 @@
+"""add full-text search indexes
+
+Revision ID: 8a73833c5216
+Revises: 6f1e1d1564d0
+Create Date: 2026-10-19 16:23:25.221421
+
+"""
+from alembic import op
+from app.models import search_index_ddl
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a73833c5216'
+down_revision = '6f1e1d1564d0'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_INDEXED_COLUMNS = {
+    'reviews': ('comment',),
+    'catalogs': ('name', 'comment'),
+    'catalog_items': ('comment',),
+}
+
+
+def upgrade():
+    # the ddl is app.models.search_index_ddl's, which create_all also runs; the sqlite
+    # statements end by indexing the rows that already exist
+    dialect = op.get_bind().dialect.name
+    for table_name, columns in SEARCH_INDEXED_COLUMNS.items():
+        for statement in search_index_ddl(table_name, columns).get(dialect, []):
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table_name in SEARCH_INDEXED_COLUMNS:
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX ix_{table_name}_search_vector')
+            op.execute(f'ALTER TABLE {table_name} DROP COLUMN search_vector')
+        elif dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER {table_name}_fts_{suffix}')
+            op.execute(f'DROP TABLE {table_name}_fts')
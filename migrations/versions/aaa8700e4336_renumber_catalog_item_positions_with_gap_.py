@@ -0,0 +1,43 @@
+"""renumber catalog item positions with gaps
+
+Revision ID: aaa8700e4336
+Revises: d0a4afc6a9ca
+Create Date: 2026-10-19 16:27:27.353461
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aaa8700e4336'
+down_revision = 'd0a4afc6a9ca'
+branch_labels = None
+depends_on = None
+
+
+CATALOG_POSITION_GAP = 1024
+
+
+def upgrade():
+    # space existing positions CATALOG_POSITION_GAP apart, keeping the current order
+    # (unpositioned items last, then by created_date)
+    op.execute(
+        'UPDATE catalog_items SET position = ('
+        'SELECT ranked.new_position FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY catalog_id ORDER BY position IS NULL, position, created_date, id'
+        f') * {CATALOG_POSITION_GAP} AS new_position FROM catalog_items'
+        ') AS ranked WHERE ranked.id = catalog_items.id)'
+    )
+
+
+def downgrade():
+    op.execute(
+        'UPDATE catalog_items SET position = ('
+        'SELECT ranked.new_position FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY catalog_id ORDER BY position, created_date, id'
+        ') - 1 AS new_position FROM catalog_items'
+        ') AS ranked WHERE ranked.id = catalog_items.id)'
+    )